@@ -91,6 +91,21 @@ async def ask_email(m: Message, state: FSMContext):
     await state.set_state(CreateLinkSG.email)
     await m.answer("Введи почту клиента:")
 
+async def _wait_for_link(sess: aiohttp.ClientSession, url: str, headers: dict, deadline_sec: float = 60.0) -> dict:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + deadline_sec
+    delay = 0.5
+    while loop.time() < deadline:
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 3.0)
+        async with sess.get(url, headers=headers) as r:
+            if r.status != 200:
+                continue
+            j = await r.json()
+        if j.get("status") != "creating":
+            return j
+    return {"ok": False, "error": "ссылка создаётся дольше обычного, проверь список ссылок в ЛК"}
+
 @dp.message(CreateLinkSG.email)
 async def create_link(m: Message, state: FSMContext):
     email = (m.text or "").strip()
@@ -120,13 +135,16 @@ async def create_link(m: Message, state: FSMContext):
                     await m.answer("Твой Telegram не привязан к личному кабинету. Зайди в ЛК и нажми «Подключить Telegram».")
                     await state.clear()
                     return
-                if r.status != 200:
+                if r.status not in (200, 202):
                     text = (await r.text())[:300]
                     safe = escape(text)
                     await m.answer(f"Ошибка {r.status}: {safe}", parse_mode=None, disable_web_page_preview=True)
                     await state.clear()
                     return
                 j = await r.json()
+            # 202: заказ заведён, ссылку создаёт воркер — ждём по status_url
+            if j.get("status") == "creating" and j.get("status_url"):
+                j = await _wait_for_link(sess, f"{MAIN_APP_URL}{j['status_url']}", headers)
     except Exception as e:
         await m.answer(f"Ошибка соединения: {escape(str(e))}", parse_mode=None, disable_web_page_preview=True)
         await state.clear()
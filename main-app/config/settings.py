@@ -195,6 +195,22 @@ CELERY_BROKER_URL = os.getenv("RABBIT_URL")
 CELERY_RESULT_BACKEND = REDIS_URL
 CELERY_TASK_ALWAYS_EAGER = False
 
+# сверка pending без вебхука (payments/reconcile.py); beat — `celery worker -B` в одном экземпляре
+RECONCILE_EVERY_SEC = int(os.getenv("RECONCILE_EVERY_SEC", 300))
+# не больше BULK_MAX_ITEMS и RATE_STATUS_BURST в pay-api; у сверки там свой бакет, квоту создания ссылок она не тратит
+RECONCILE_BATCH = int(os.getenv("RECONCILE_BATCH", 100))
+RECONCILE_MAX_BATCHES = int(os.getenv("RECONCILE_MAX_BATCHES", 20))
+RECONCILE_MIN_AGE_MIN = int(os.getenv("RECONCILE_MIN_AGE_MIN", 10))
+RECONCILE_MAX_AGE_HOURS = int(os.getenv("RECONCILE_MAX_AGE_HOURS", 72))
+RECONCILE_LOCK_SEC = int(os.getenv("RECONCILE_LOCK_SEC", 900))
+
+CELERY_BEAT_SCHEDULE = {
+    "reconcile-pending-payments": {
+        "task": "payments.reconcile_pending",
+        "schedule": RECONCILE_EVERY_SEC,
+    },
+}
+
 RATE_SHORT = int(os.getenv('RATE_SHORT', 30))
 RATE_SHORT_MAX = int(os.getenv('RATE_SHORT_MAX', 3))
 RATE_HOUR = int(os.getenv('RATE_HOUR', 3600))
@@ -207,6 +223,35 @@ FORM_MAX_SECONDS = int(os.getenv('FORM_MAX_SECONDS', 3600))
 
 
 PAY_API_URL = os.getenv("PAY_API_URL", "http://pay-api:8000")
+# (connect, read): read чуть выше потолка таймаута провайдера в pay-api (FK_TIMEOUT_SEC / PLNK_TIMEOUT_SEC);
+# при открытом breaker pay-api отвечает 503 сразу и воркер gunicorn не висит
+PAY_API_TIMEOUT = (
+    float(os.getenv("PAY_API_CONNECT_TIMEOUT", "3")),
+    float(os.getenv("PAY_API_READ_TIMEOUT", "18")),
+)
+# пул соединений к pay-api на процесс (payments/pay_api.py); ретраи только connect и 502/503/504
+PAY_API_POOL_SIZE = int(os.getenv("PAY_API_POOL_SIZE", 10))
+PAY_API_RETRIES = int(os.getenv("PAY_API_RETRIES", 2))
+PAY_API_BACKOFF = float(os.getenv("PAY_API_BACKOFF", "0.3"))
+PAY_API_STATS_EVERY = int(os.getenv("PAY_API_STATS_EVERY", 200))  # 0 — не логировать сводку
+# как часто процесс сливает счётчики и гистограмму задержек клиента pay-api в Redis
+# (отдаются в формате Prometheus на /payments/internal/pay_api_metrics/ с X-Internal-Token)
+PAY_API_METRICS_FLUSH_SEC = float(os.getenv("PAY_API_METRICS_FLUSH_SEC", "10"))
+
+# номера заказов (payments/order_seq.py): блок на процесс (>1 — номера продавца могут идти не по порядку
+# и с пропусками при рестарте) и шаг high-water mark в SellerDayCounter
+ORDER_SEQ_BLOCK = int(os.getenv("ORDER_SEQ_BLOCK", 1))
+ORDER_SEQ_WRITEBACK = int(os.getenv("ORDER_SEQ_WRITEBACK", 20))
+ORDER_PREVIEW_CACHE_SEC = int(os.getenv("ORDER_PREVIEW_CACHE_SEC", 5))
+
+# снимок PaymentMethod в памяти процесса (core/payment_methods.py): как часто сверять версию в Redis
+# и предельный возраст снимка, если invalidate() не дошёл
+PAYMENT_METHODS_CHECK_SEC = float(os.getenv("PAYMENT_METHODS_CHECK_SEC", "5"))
+PAYMENT_METHODS_MAX_AGE_SEC = float(os.getenv("PAYMENT_METHODS_MAX_AGE_SEC", "300"))
+
+# создание ссылки в фоне (payments.create_link): запрос возвращает order_id сразу, клиент поллит статус
+PAY_LINK_ASYNC = os.getenv("PAY_LINK_ASYNC", "1") == "1"
+PAY_LINK_MAX_RETRIES = int(os.getenv("PAY_LINK_MAX_RETRIES", 4))
 
 
 
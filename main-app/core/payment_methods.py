@@ -0,0 +1,109 @@
+import time
+import logging
+import threading
+from decimal import Decimal
+from typing import Dict, List, NamedTuple, Optional
+
+import redis
+from django.conf import settings
+
+from .models import PaymentMethod
+
+logger = logging.getLogger(__name__)
+
+# ===== реестр платёжных методов: снимок таблицы в памяти процесса =====
+# Таблица маленькая и меняется только из админки, а читается на каждой форме, в боте и в списках платежей.
+# Каждый процесс держит снимок и раз в PAYMENT_METHODS_CHECK_SEC сверяет номер версии в Redis;
+# save/delete PaymentMethod (в т.ч. из админки) увеличивают версию после коммита — все процессы перечитают.
+# queryset.update() сигналов не шлёт: после него нужен invalidate(), иначе изменения доедут через PAYMENT_METHODS_MAX_AGE_SEC.
+VERSION_KEY = "paymethods:version"
+
+
+class Snapshot(NamedTuple):
+    version: Optional[int]
+    by_id: Dict[int, PaymentMethod]
+    active: List[PaymentMethod]  # is_active, в порядке sort, id
+    default_id: Optional[int]  # активный is_default, без подстановки первого
+    loaded_at: float
+
+
+_client: Optional[redis.Redis] = None
+_snapshot: Optional[Snapshot] = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _redis() -> redis.Redis:
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+    return _client
+
+
+def _remote_version() -> Optional[int]:
+    """None — Redis недоступен; тогда снимок просто перечитывается из БД раз в интервал проверки."""
+    try:
+        return int(_redis().get(VERSION_KEY) or 0)
+    except redis.RedisError as e:
+        logger.warning("payment methods: Redis unavailable, reloading from DB: %s", e)
+        return None
+
+
+def _load(version: Optional[int]) -> Snapshot:
+    rows = list(PaymentMethod.objects.order_by("sort", "id"))
+    active = [m for m in rows if m.is_active]
+    default = next((m.id for m in active if m.is_default), None)
+    return Snapshot(version, {m.id: m for m in rows}, active, default, time.monotonic())
+
+
+def snapshot() -> Snapshot:
+    global _snapshot, _checked_at
+    now = time.monotonic()
+    snap = _snapshot
+    if snap is not None and now - _checked_at < settings.PAYMENT_METHODS_CHECK_SEC:
+        return snap
+    with _lock:
+        if _snapshot is not None and _snapshot is not snap:
+            return _snapshot  # соседний поток уже перечитал
+        version = _remote_version()
+        # страховка на случай потерянного invalidate(): снимок не старше PAYMENT_METHODS_MAX_AGE_SEC
+        if (snap is None or version is None or version != snap.version
+                or now - snap.loaded_at > settings.PAYMENT_METHODS_MAX_AGE_SEC):
+            snap = _snapshot = _load(version)
+        _checked_at = now
+        return snap
+
+
+def get(method_id) -> Optional[PaymentMethod]:
+    try:
+        return snapshot().by_id.get(int(method_id))
+    except (TypeError, ValueError):
+        return None
+
+
+def active() -> List[PaymentMethod]:
+    return snapshot().active
+
+
+def is_active(method_id) -> bool:
+    m = get(method_id)
+    return bool(m and m.is_active)
+
+
+def default_id() -> Optional[int]:
+    return snapshot().default_id
+
+
+def min_amounts() -> Dict[int, Decimal]:
+    return {m.id: m.min_amount for m in snapshot().by_id.values()}
+
+
+def invalidate() -> None:
+    """Новая версия для всех процессов; свой снимок сбрасываем сразу."""
+    global _snapshot
+    try:
+        _redis().incr(VERSION_KEY)
+    except redis.RedisError as e:
+        logger.warning("payment methods: version bump failed, other processes reload within PAYMENT_METHODS_MAX_AGE_SEC: %s", e)
+    with _lock:
+        _snapshot = None
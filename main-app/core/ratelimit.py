@@ -0,0 +1,140 @@
+import time
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import redis
+from django.conf import settings
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+# Token bucket, несколько ярусов за один вызов (тот же скрипт в pay-api/app/ratelimit.py).
+# KEYS — бакеты; ARGV[1] — стоимость, дальше пары (ёмкость, пополнение в секунду).
+TOKEN_BUCKET_LUA = """
+local t = redis.call("TIME")
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local cost = tonumber(ARGV[1])
+local left = {}
+local wait = 0
+for i = 1, #KEYS do
+    local cap = tonumber(ARGV[2 * i])
+    local rate = tonumber(ARGV[2 * i + 1])
+    local b = redis.call("HMGET", KEYS[i], "tokens", "ts")
+    local tokens = tonumber(b[1]) or cap
+    local ts = tonumber(b[2]) or now
+    tokens = math.min(cap, tokens + math.max(0, now - ts) * rate)
+    local need = math.min(cost, cap)
+    if tokens < need then
+        wait = math.max(wait, (need - tokens) / rate)
+    end
+    left[i] = tokens - need
+end
+if wait > 0 then
+    return {0, tostring(wait)}
+end
+for i = 1, #KEYS do
+    local cap = tonumber(ARGV[2 * i])
+    local rate = tonumber(ARGV[2 * i + 1])
+    redis.call("HSET", KEYS[i], "tokens", left[i], "ts", now)
+    redis.call("PEXPIRE", KEYS[i], math.ceil(cap / rate * 1000) + 1000)
+end
+return {1, "0"}
+"""
+
+# (ёмкость, пополнение токенов в секунду)
+Tier = Tuple[float, float]
+
+_client: Optional[redis.Redis] = None
+
+
+def _redis() -> redis.Redis:
+    global _client
+    if _client is None:
+        # короткий таймаут: лимитер не должен держать воркер gunicorn
+        _client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+    return _client
+
+
+def tiers_from_settings() -> List[Tier]:
+    """RATE_SHORT_MAX за RATE_SHORT секунд и RATE_HOUR_MAX за RATE_HOUR."""
+    tiers = []
+    for limit, window in ((settings.RATE_SHORT_MAX, settings.RATE_SHORT),
+                          (settings.RATE_HOUR_MAX, settings.RATE_HOUR)):
+        if limit > 0 and window > 0:
+            tiers.append((float(limit), limit / window))
+    return tiers
+
+
+class RateLimiter:
+    """
+    Лимит на клиента в Redis, атомарно для всех воркеров.
+    Локально помним только отказы — пока клиент ждёт retry_after, в Redis не ходим.
+    """
+
+    def __init__(self, scope: str, tiers: Sequence[Tier], local_max: int = 10000):
+        self.scope = scope
+        self.tiers = list(tiers)
+        self.local_max = local_max
+        self._denied_until: Dict[str, float] = {}
+        self._script = None
+
+    def _local_wait(self, ident: str) -> float:
+        until = self._denied_until.get(ident)
+        if until is None:
+            return 0.0
+        wait = until - time.monotonic()
+        if wait <= 0:
+            self._denied_until.pop(ident, None)
+            return 0.0
+        return wait
+
+    def _remember_denial(self, ident: str, wait: float) -> None:
+        if len(self._denied_until) >= self.local_max:
+            now = time.monotonic()
+            self._denied_until = {k: v for k, v in self._denied_until.items() if v > now}
+            if len(self._denied_until) >= self.local_max:
+                self._denied_until.clear()
+        self._denied_until[ident] = time.monotonic() + wait
+
+    def acquire(self, ident, cost: int = 1) -> float:
+        """0 — пропускаем, иначе сколько секунд ждать. Redis недоступен — пропускаем."""
+        if not self.tiers:
+            return 0.0
+        ident = str(ident)
+        wait = self._local_wait(ident)
+        if wait > 0:
+            return wait
+
+        keys = [f"rl:{self.scope}:{i}:{ident}" for i in range(len(self.tiers))]
+        args = [cost]
+        for cap, rate in self.tiers:
+            args += [cap, rate]
+        try:
+            if self._script is None:
+                self._script = _redis().register_script(TOKEN_BUCKET_LUA)
+            allowed, wait_raw = self._script(keys=keys, args=args)
+        except redis.RedisError as e:
+            logger.warning("Rate limiter %s unavailable: %s", self.scope, e)
+            return 0.0
+
+        if int(allowed):
+            return 0.0
+        wait = float(wait_raw)
+        self._remember_denial(ident, wait)
+        logger.info("Rate limit hit: %s=%s retry_after=%.1fs", self.scope, ident, wait)
+        return wait
+
+
+def too_many_requests(wait: float) -> JsonResponse:
+    retry_after = max(1, int(wait + 0.999))
+    resp = JsonResponse(
+        {"ok": False, "error": "Слишком много запросов, попробуйте позже", "retry_after": retry_after},
+        status=429,
+    )
+    resp["Retry-After"] = str(retry_after)
+    return resp
+
+
+# создание ссылок: на продавца (ЛК) и на Telegram ID (бот)
+seller_limiter = RateLimiter("seller", tiers_from_settings())
+telegram_limiter = RateLimiter("tg", tiers_from_settings())
@@ -0,0 +1,13 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import payment_methods
+from .models import PaymentMethod
+
+
+@receiver(post_save, sender=PaymentMethod)
+@receiver(post_delete, sender=PaymentMethod)
+def bump_payment_methods(sender, **kwargs):
+    # после коммита: иначе соседний процесс перечитает таблицу до изменения и запомнит новую версию
+    transaction.on_commit(payment_methods.invalidate)
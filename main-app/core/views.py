@@ -1,9 +1,9 @@
 from django.http import JsonResponse
-from .models import PaymentMethod
+from . import payment_methods
 
 def payment_methods_api(request):
-    rows = (PaymentMethod.objects
-            .filter(is_active=True)
-            .order_by('sort','id')
-            .values('id','name','min_amount','is_default'))
-    return JsonResponse({"ok": True, "methods": list(rows)})
\ No newline at end of file
+    rows = [
+        {"id": m.id, "name": m.name, "min_amount": m.min_amount, "is_default": m.is_default}
+        for m in payment_methods.active()
+    ]
+    return JsonResponse({"ok": True, "methods": rows})
@@ -1,21 +1,23 @@
 from decimal import Decimal
 from datetime import datetime
-import uuid, requests, time, logging
+import logging
 from django import forms
 from django.conf import settings
 from django.utils import timezone
+from django.db import transaction
 from django.core.exceptions import ValidationError
 from .models import Payment, Tag
-from .services import next_order_id_for
-from core.models import PaymentMethod
+from .services import create_with_order_id
+from . import pay_api
+from core import payment_methods
 
 log = logging.getLogger(__name__)
 
 def method_choices():
-    return [(m.id, f"{m.id} — {m.name}") for m in PaymentMethod.objects.filter(is_active=True).order_by("sort","id")]
+    return [(m.id, f"{m.id} — {m.name}") for m in payment_methods.active()]
 
 def min_by_method_map():
-    return {m.id: m.min_amount for m in PaymentMethod.objects.all()}
+    return payment_methods.min_amounts()
 
 class CreateLinkForm(forms.Form):
     amount = forms.DecimalField(min_value=Decimal("0.01"), max_digits=12, decimal_places=2)
@@ -46,71 +48,132 @@ class CreateLinkForm(forms.Form):
                     raise forms.ValidationError("Некорректный tag_id")
         return c
 
-    def save(self, user) -> Payment:
-        tag_obj = None
+    def _tag_for(self, user):
         tid = self.cleaned_data.get("tag_id")
-        if tid:
-            try:
-                tag_obj = Tag.objects.get(user=user, id=tid)
-            except Tag.DoesNotExist:
-                tag_obj = None
-
-        order_id, seq, prefix, day = next_order_id_for(user)
-        idem = uuid.uuid4().hex
-
-        amt = Decimal(self.cleaned_data["amount"]).quantize(Decimal("0.01"))
-        payload = {
-            "amount": float(amt),
-            "email": self.cleaned_data["email"],
-            "ip": "0.0.0.0",
-            "payment_method": int(self.cleaned_data["method"]),
-            "description": self.cleaned_data.get("comment") or "",
-            "payment_id": order_id,
-            "ttl_minutes": int(self.cleaned_data["ttl_minutes"]),
-        }
-
-        t0 = time.time()
-        r = requests.post(
-            f"{settings.PAY_API_URL}/internal/create_link",
-            json=payload,
-            headers={"X-Internal-Token": settings.PAY_INTERNAL_TOKEN, "X-Idempotency-Key": idem},
-            timeout=(3, 25),
+        if not tid:
+            return None
+        try:
+            return Tag.objects.get(user=user, id=tid)
+        except Tag.DoesNotExist:
+            return None
+
+    def save(self, user) -> Payment:
+        """
+        Синхронно: pay-api вызывается внутри запроса. Номер оказался занят —
+        ссылка берётся заново под новым номером (старый заказ у провайдера просто истечёт).
+        """
+        tag_obj = self._tag_for(user)
+        ttl = int(self.cleaned_data["ttl_minutes"])
+
+        def create(order_id, seq, prefix, day):
+            data = request_pay_link(
+                order_id=order_id,
+                amount=self.cleaned_data["amount"],
+                email=self.cleaned_data["email"],
+                method=int(self.cleaned_data["method"]),
+                comment=self.cleaned_data.get("comment") or "",
+                ttl_minutes=ttl,
+            )
+            return Payment.objects.create(
+                user=user,
+                payment_id=data["payment_id"],
+                token=data["token"],
+                fk_url=data["fk_url"],
+                public_url=data["public_url"],
+                amount=self.cleaned_data["amount"],
+                email=self.cleaned_data["email"],
+                method=int(self.cleaned_data["method"]),
+                comment=self.cleaned_data.get("comment", ""),
+                tag="",
+                tag_obj=tag_obj,
+                status="pending",
+                expires_at=expires_from(data, ttl),
+                order_prefix=prefix,
+                order_date=day,
+                order_seq=seq,
+                order_id=order_id,
+            )
+
+        return create_with_order_id(user, create)
+
+    def save_async(self, user) -> Payment:
+        """
+        Резервирует номер и пишет Payment в статусе creating; pay-api вызывает
+        Celery-задача payments.create_link. Результат клиент забирает поллингом.
+        """
+        from .tasks import create_payment_link
+
+        ttl = int(self.cleaned_data["ttl_minutes"])
+        tag_obj = self._tag_for(user)
+        p = create_with_order_id(
+            user, lambda order_id, seq, prefix, day: self._create_reserved(user, tag_obj, order_id, seq, prefix, day, ttl)
         )
-        log.info("pay-api create_link %s in %.3fs -> %s %s",
-                 order_id, time.time() - t0, r.status_code, (r.text or "")[:200])
-        r.raise_for_status()
-        data = r.json()
-        exp = data.get("expires_at")
-        if exp:
-            try:
-                dt = datetime.fromisoformat(exp.replace("Z", "+00:00"))
-                if timezone.is_naive(dt):
-                    dt = timezone.make_aware(dt, timezone.utc)
-                expires_at = dt
-            except Exception:
-                expires_at = timezone.now() + timezone.timedelta(minutes=int(self.cleaned_data["ttl_minutes"]))
-        else:
-            expires_at = timezone.now() + timezone.timedelta(minutes=int(self.cleaned_data["ttl_minutes"]))
-
-        p = Payment.objects.create(
+        transaction.on_commit(lambda: _enqueue_create_link(create_payment_link, p.id, ttl))
+        return p
+
+    def _create_reserved(self, user, tag_obj, order_id, seq, prefix, day, ttl) -> Payment:
+        return Payment.objects.create(
             user=user,
-            payment_id=data["payment_id"],
-            token=data["token"],
-            fk_url=data["fk_url"],
-            public_url=data["public_url"],
+            payment_id=order_id,
+            # token уникален, настоящий придёт от pay-api
+            token=f"{CREATING_TOKEN_PREFIX}{order_id}",
+            fk_url="",
+            public_url="",
             amount=self.cleaned_data["amount"],
             email=self.cleaned_data["email"],
             method=int(self.cleaned_data["method"]),
             comment=self.cleaned_data.get("comment", ""),
             tag="",
-            status="pending",
-            expires_at=expires_at,
+            tag_obj=tag_obj,
+            status="creating",
+            expires_at=timezone.now() + timezone.timedelta(minutes=ttl),
             order_prefix=prefix,
             order_date=day,
             order_seq=seq,
             order_id=order_id,
         )
-        if tag_obj:
-            p.tag_obj = tag_obj
-            p.save(update_fields=["tag_obj"])
-        return p
+
+
+def _enqueue_create_link(task, payment_id: int, ttl_minutes: int) -> None:
+    try:
+        task.delay(payment_id, ttl_minutes)
+    except Exception as e:
+        # брокер недоступен — создаём ссылку в этом же запросе, как в синхронном режиме.
+        # Одна попытка: в eager-режиме countdown не работает, ретраи держали бы воркер gunicorn.
+        log.warning("create_link enqueue failed, running inline: %s", e)
+        task.apply(args=(payment_id, ttl_minutes), retries=task.max_retries)
+
+
+CREATING_TOKEN_PREFIX = "creating:"
+
+
+def request_pay_link(*, order_id, amount, email, method, comment, ttl_minutes) -> dict:
+    """POST pay-api /internal/create_link; ошибки HTTP пробрасываются (requests.HTTPError)."""
+    amt = Decimal(amount).quantize(Decimal("0.01"))
+    payload = {
+        "amount": float(amt),
+        "email": email,
+        "ip": "0.0.0.0",
+        "payment_method": int(method),
+        "description": comment or "",
+        "payment_id": order_id,
+        "ttl_minutes": int(ttl_minutes),
+    }
+    r = pay_api.post("/internal/create_link", payload, idem=pay_api.idempotency_key(order_id))
+    if not r.ok:
+        log.warning("pay-api create_link %s -> %s %s", order_id, r.status_code, (r.text or "")[:200])
+    r.raise_for_status()
+    return r.json()
+
+
+def expires_from(data: dict, ttl_minutes: int):
+    exp = data.get("expires_at")
+    if exp:
+        try:
+            dt = datetime.fromisoformat(exp.replace("Z", "+00:00"))
+            if timezone.is_naive(dt):
+                dt = timezone.make_aware(dt, timezone.utc)
+            return dt
+        except Exception:
+            pass
+    return timezone.now() + timezone.timedelta(minutes=int(ttl_minutes))
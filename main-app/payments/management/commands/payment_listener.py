@@ -1,9 +1,13 @@
 import asyncio
-import json
+import logging
 import aio_pika
 from django.core.management.base import BaseCommand
+from payments.serialization import decode_event
 from payments.tasks import handle_payment_event
 
+logger = logging.getLogger(__name__)
+
+
 class Command(BaseCommand):
     help = "Listen for payment events from RabbitMQ"
 
@@ -14,7 +18,14 @@ class Command(BaseCommand):
         async with q.iterator() as queue_iter:
             async for msg in queue_iter:
                 async with msg.process():
-                    handle_payment_event.delay(msg.body.decode())
+                    # декодер выбираем по content_type + x-event-version
+                    try:
+                        data = decode_event(msg.body, msg.content_type, msg.headers)
+                    except ValueError as e:
+                        # битое/неизвестное сообщение: ретраи не помогут — логируем и подтверждаем
+                        logger.error("Undecodable payment event (%s): %r", e, msg.body[:500])
+                        continue
+                    handle_payment_event.delay(data)
 
     def handle(self, *args, **options):
         asyncio.run(self.listen())
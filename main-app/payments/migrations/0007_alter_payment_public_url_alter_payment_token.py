@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0006_alter_payment_method'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='public_url',
+            field=models.URLField(max_length=600),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='token',
+            field=models.CharField(max_length=512, unique=True),
+        ),
+    ]
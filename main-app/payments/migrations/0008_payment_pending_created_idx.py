@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0007_alter_payment_public_url_alter_payment_token'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['created_at', 'id'], name='payment_pending_created_idx'),
+        ),
+    ]
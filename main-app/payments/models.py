@@ -3,6 +3,7 @@ from django.conf import settings
 from decimal import Decimal, ROUND_HALF_UP
 from django.core.validators import MinValueValidator, MaxValueValidator
 from core.models import PaymentMethod
+from core import payment_methods
 
 class SellerDayCounter(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -50,9 +51,10 @@ class Payment(models.Model):
     order_seq = models.PositiveIntegerField()
 
     payment_id = models.CharField(max_length=64, unique=True)
-    token = models.CharField(max_length=64, unique=True)
+    # подписанные токены pay-api (s1.*) несут URL провайдера внутри и заметно длиннее uuid
+    token = models.CharField(max_length=512, unique=True)
     fk_url = models.URLField()
-    public_url = models.URLField()
+    public_url = models.URLField(max_length=600)
     fk_intid = models.BigIntegerField(null=True, blank=True, db_index=True)
     status = models.CharField(max_length=16, default="pending")
     paid_at = models.DateTimeField(null=True, blank=True)
@@ -81,16 +83,20 @@ class Payment(models.Model):
         indexes = [
             models.Index(fields=["user", "created_at"]),
             models.Index(fields=["user", "status", "created_at"]),
+            # сверка зависших оплат (reconcile.py) идёт keyset-ом по (created_at, id)
+            models.Index(fields=["created_at", "id"], condition=models.Q(status="pending"),
+                         name="payment_pending_created_idx"),
         ]
         ordering = ["-created_at"]
 
     @property
     def method_obj(self) -> PaymentMethod | None:
-        return PaymentMethod.objects.filter(pk=self.method).first()
+        return payment_methods.get(self.method)
 
     @property
     def method_label(self) -> str:
-        return self.method_obj.name if self.method_obj else str(self.method)
+        m = self.method_obj
+        return m.name if m else str(self.method)
 
     def _qround(self, value):
         return Decimal(value).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
@@ -0,0 +1,209 @@
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from .models import Payment, SellerDayCounter
+
+logger = logging.getLogger(__name__)
+
+# ===== номера заказов: INCR в Redis вместо блокировки строки SellerDayCounter на каждый номер =====
+# Схема hi/lo. orderseq:{prefix}:{YYYYMMDD} — последний выданный номер; в хеше :limit —
+# диапазон (base, limit], который Redis может выдавать сам. Выход за limit — короткая блокировка
+# строки SellerDayCounter раз в ORDER_SEQ_WRITEBACK номеров: last_seq поднимается на окно вперёд, потом limit.
+# limit поднимается только после коммита last_seq (on_commit), так что инвариант last_seq >= всего, что выдал Redis,
+# держится и при откате транзакции: после потери Redis и в fallback под той же
+# блокировкой счёт продолжается с max(last_seq, MAX(order_seq)) без повторов (с дырой до окна).
+# base двигается, только когда fallback выдал номера за limit: всё, что Redis выдал до base, недействительно.
+
+# KEYS: счётчик, хеш limit/base; ARGV: floor ("" — не знаем), размер блока, TTL.
+# Ключа нет и floor не передан — {-1, 0, 0}: вызывающий поднимет floor из БД и повторит.
+ALLOC_LUA = """
+if redis.call("EXISTS", KEYS[1]) == 0 then
+    if ARGV[1] == "" then
+        return {-1, 0, 0}
+    end
+    if redis.call("SET", KEYS[1], ARGV[1], "NX") then
+        redis.call("HSET", KEYS[2], "limit", ARGV[1], "base", ARGV[1])
+    end
+end
+local hi = redis.call("INCRBY", KEYS[1], tonumber(ARGV[2]))
+redis.call("EXPIRE", KEYS[1], tonumber(ARGV[3]))
+redis.call("EXPIRE", KEYS[2], tonumber(ARGV[3]))
+local lim = redis.call("HMGET", KEYS[2], "limit", "base")
+return {hi, tonumber(lim[1] or "0"), tonumber(lim[2] or "0")}
+"""
+
+# поднять значение ключа до ARGV[1], если оно меньше
+RAISE_LUA = """
+local cur = tonumber(redis.call("GET", KEYS[1]) or "0")
+if cur < tonumber(ARGV[1]) then
+    redis.call("SET", KEYS[1], ARGV[1], "EX", tonumber(ARGV[2]))
+    return tonumber(ARGV[1])
+end
+return cur
+"""
+
+# KEYS: хеш limit/base; ARGV: limit, base, TTL. Только вверх: запоздавший on_commit не откатит соседа.
+LIMIT_LUA = """
+local cur = redis.call("HMGET", KEYS[1], "limit", "base")
+if tonumber(cur[1] or "0") < tonumber(ARGV[1]) then
+    redis.call("HSET", KEYS[1], "limit", ARGV[1])
+end
+if tonumber(cur[2] or "0") < tonumber(ARGV[2]) then
+    redis.call("HSET", KEYS[1], "base", ARGV[2])
+end
+redis.call("EXPIRE", KEYS[1], tonumber(ARGV[3]))
+"""
+
+KEY_TTL_SEC = 3 * 24 * 3600
+
+_client: Optional[redis.Redis] = None
+_scripts: Dict[str, object] = {}
+
+# предвыделенные блоки на процесс: (user_id, day) -> [следующий, последний]
+_blocks: Dict[Tuple[int, object], list] = {}
+_blocks_lock = threading.Lock()
+
+
+def _redis() -> redis.Redis:
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+    return _client
+
+
+def _script(name: str, body: str):
+    if name not in _scripts:
+        _scripts[name] = _redis().register_script(body)
+    return _scripts[name]
+
+
+def seq_key(prefix: str, day) -> str:
+    return f"orderseq:{prefix}:{day.strftime('%Y%m%d')}"
+
+
+def _max_used(user, day) -> int:
+    return Payment.objects.filter(user=user, order_date=day).aggregate(m=Max("order_seq"))["m"] or 0
+
+
+def db_floor(user, day) -> int:
+    """Последний номер, который мог быть выдан: high-water mark счётчика или MAX(order_seq)."""
+    mark = SellerDayCounter.objects.filter(user=user, day=day).values_list("last_seq", flat=True).first() or 0
+    return max(mark, _max_used(user, day))
+
+
+def _raise_limit(key: str, limit: int, base: int) -> None:
+    try:
+        _script("limit", LIMIT_LUA)(keys=[f"{key}:limit"], args=[limit, base, KEY_TTL_SEC])
+    except redis.RedisError as e:
+        # следующий за limit процесс снова продлит окно (с дырой в нумерации, без повторов)
+        logger.warning("orderseq %s: limit raise to %s failed: %s", key, limit, e)
+
+
+def _extend(user, day, key: str, lo: int, hi: int) -> bool:
+    """
+    Блок вне (base, limit]: под блокировкой строки двигаем high-water mark, limit — после коммита.
+    False — блок недействителен (эти номера мог выдать fallback), надо взять новый.
+    """
+    r = _redis()
+    step = settings.ORDER_SEQ_WRITEBACK
+    with transaction.atomic():
+        row, _ = SellerDayCounter.objects.select_for_update().get_or_create(
+            user=user, day=day, defaults={"last_seq": 0}
+        )
+        limit, base = (int(x or 0) for x in r.hmget(f"{key}:limit", "limit", "base"))
+        if lo <= base:
+            return False
+        if hi <= limit:
+            return True  # соседний процесс уже продлил
+        if row.last_seq > limit:
+            # fallback выдавал номера за limit (или сосед закоммитил окно, но ещё не поднял limit —
+            # тогда просто пропускаем его хвост): переносим Redis за них
+            logger.info("orderseq %s: last_seq %s is past limit %s, skipping ahead", key, row.last_seq, limit)
+            base = row.last_seq
+            _script("raise", RAISE_LUA)(keys=[key], args=[base, KEY_TTL_SEC])
+            hi = base
+        row.last_seq = -(-hi // step) * step + step
+        row.save(update_fields=["last_seq"])
+        # Redis может выдавать до нового limit только когда last_seq уже в БД
+        limit = row.last_seq
+        transaction.on_commit(lambda: _raise_limit(key, limit, base))
+    return lo > base
+
+
+def _alloc_redis(user, prefix: str, day, n: int) -> Tuple[int, int]:
+    """Блок [lo, hi] из Redis."""
+    key = seq_key(prefix, day)
+    alloc = _script("alloc", ALLOC_LUA)
+    for _ in range(5):
+        hi, limit, base = (int(x) for x in alloc(keys=[key, f"{key}:limit"], args=["", n, KEY_TTL_SEC]))
+        if hi < 0:
+            # первый номер дня или Redis потерял ключ; гонку двух восстановителей решает SET NX
+            floor = db_floor(user, day)
+            hi, limit, base = (int(x) for x in alloc(keys=[key, f"{key}:limit"], args=[floor, n, KEY_TTL_SEC]))
+        lo = hi - n + 1
+        if (lo > base and hi <= limit) or _extend(user, day, key, lo, hi):
+            return lo, hi
+    raise redis.RedisError(f"orderseq {key}: could not catch up with fallback")
+
+
+def _alloc_locked(user, day) -> int:
+    """Старый путь под блокировкой строки — когда Redis недоступен."""
+    with transaction.atomic():
+        row, _ = SellerDayCounter.objects.select_for_update().get_or_create(
+            user=user, day=day, defaults={"last_seq": 0}
+        )
+        row.last_seq = max(row.last_seq, _max_used(user, day)) + 1
+        row.save(update_fields=["last_seq"])
+        return row.last_seq
+
+
+def allocate(user, prefix: str, day) -> int:
+    """Следующий номер продавца за день. С ORDER_SEQ_BLOCK > 1 номера берутся из блока процесса."""
+    block = max(1, settings.ORDER_SEQ_BLOCK)
+    slot = (user.pk, day)
+    if block > 1:
+        with _blocks_lock:
+            cur = _blocks.get(slot)
+            if cur and cur[0] <= cur[1]:
+                seq = cur[0]
+                cur[0] += 1
+                return seq
+    try:
+        lo, hi = _alloc_redis(user, prefix, day, block)
+    except redis.RedisError as e:
+        logger.warning("orderseq: Redis unavailable, falling back to row lock: %s", e)
+        return _alloc_locked(user, day)
+    if hi > lo:
+        with _blocks_lock:
+            # блоки прошлых дней больше не нужны
+            for k in [k for k in _blocks if k[1] != day]:
+                _blocks.pop(k, None)
+            _blocks[slot] = [lo + 1, hi]
+    return lo
+
+
+def peek(user, prefix: str, day) -> int:
+    """Последний выданный номер (для превью, ничего не резервирует)."""
+    try:
+        raw = _redis().get(seq_key(prefix, day))
+        if raw is not None:
+            return int(raw)
+    except redis.RedisError as e:
+        logger.warning("orderseq peek: Redis unavailable: %s", e)
+    return _max_used(user, day)
+
+
+def resync(user, prefix: str, day) -> None:
+    """После IntegrityError по (user, order_date, order_seq): поднять счётчик до того, что уже в БД."""
+    with _blocks_lock:
+        _blocks.pop((user.pk, day), None)
+    try:
+        _script("raise", RAISE_LUA)(keys=[seq_key(prefix, day)], args=[db_floor(user, day), KEY_TTL_SEC])
+    except redis.RedisError as e:
+        logger.warning("orderseq resync failed: %s", e)
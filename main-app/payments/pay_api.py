@@ -0,0 +1,209 @@
+import os
+import hmac
+import time
+import hashlib
+import logging
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+import redis
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# ===== клиент pay-api: keep-alive пул на процесс, ретраи с джиттером =====
+# Ретраи безопасны только потому, что ключ идемпотентности выводится из order_id:
+# повтор того же запроса pay-api отдаёт из своего кэша, второго заказа у провайдера нет.
+
+_session: Optional[requests.Session] = None
+_session_pid: Optional[int] = None
+
+# последние задержки для перцентилей; на процесс, как и сам пул
+_latencies = deque(maxlen=500)
+_stats = {"calls": 0, "errors": 0, "retries": 0}
+
+# ===== метрики клиента: общие для всех процессов, в Redis =====
+# Процесс копит приращения счётчиков и гистограммы задержек у себя и раз в PAY_API_METRICS_FLUSH_SEC
+# сливает их одним пайплайном в хеш METRICS_KEY. /payments/internal/pay_api_metrics/ отдаёт
+# сумму по всем процессам в текстовом формате Prometheus.
+METRICS_KEY = "payapi_client:metrics"
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0)
+
+_client: Optional[redis.Redis] = None
+# поле хеша -> приращение; поля: "<path>|<метрика>|<метка>"
+_pending: Dict[str, float] = {}
+_flushed_at = 0.0
+_metrics_lock = threading.Lock()
+
+
+def _retry() -> Retry:
+    return Retry(
+        total=settings.PAY_API_RETRIES,
+        connect=settings.PAY_API_RETRIES,
+        # read-таймаут не повторяем: провайдер уже мог принять заказ, а клиент ждёт PAY_API_TIMEOUT
+        read=0,
+        status=settings.PAY_API_RETRIES,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=None,  # POST тоже: запросы идемпотентны по ключу
+        backoff_factor=settings.PAY_API_BACKOFF,
+        backoff_jitter=settings.PAY_API_BACKOFF,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+def session() -> requests.Session:
+    """Одна сессия на процесс; после fork (gunicorn, prefork Celery) пул создаётся заново."""
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        s = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.PAY_API_POOL_SIZE, max_retries=_retry())
+        s.mount("http://", adapter)
+        s.mount("https://", adapter)
+        s.headers["X-Internal-Token"] = settings.PAY_INTERNAL_TOKEN
+        _session, _session_pid = s, pid
+    return _session
+
+
+def idempotency_key(order_id: str, op: str = "create_link") -> str:
+    """Один и тот же ключ для всех попыток по заказу; без секрета ключ не угадать."""
+    msg = f"{op}:{order_id}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), msg, hashlib.sha256).hexdigest()[:32]
+
+
+def post(path: str, payload: dict, *, idem: Optional[str] = None, timeout=None) -> requests.Response:
+    """POST PAY_API_URL + path. Ошибки соединения пробрасываются (requests.RequestException)."""
+    headers = {"X-Idempotency-Key": idem} if idem else None
+    t0 = time.perf_counter()
+    r = None
+    try:
+        r = session().post(
+            f"{settings.PAY_API_URL}{path}",
+            json=payload,
+            headers=headers,
+            timeout=timeout or settings.PAY_API_TIMEOUT,
+        )
+        return r
+    finally:
+        _observe(path, time.perf_counter() - t0, r)
+
+
+def _observe(path: str, elapsed: float, r: Optional[requests.Response]) -> None:
+    _latencies.append(elapsed)
+    _stats["calls"] += 1
+    retries = len(r.raw.retries.history) if r is not None and getattr(r.raw, "retries", None) else 0
+    _stats["retries"] += retries
+    if r is None or r.status_code >= 500:
+        _stats["errors"] += 1
+    outcome = "error" if r is None else ("5xx" if r.status_code >= 500 else "ok")
+    _record(path, elapsed, outcome, retries)
+    logger.info("pay-api %s in %.3fs -> %s retries=%s",
+                path, elapsed, r.status_code if r is not None else "error", retries)
+    if settings.PAY_API_STATS_EVERY and _stats["calls"] % settings.PAY_API_STATS_EVERY == 0:
+        logger.info("pay-api client stats: %s", stats())
+
+
+def _redis() -> redis.Redis:
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+    return _client
+
+
+def _record(path: str, elapsed: float, outcome: str, retries: int) -> None:
+    global _flushed_at
+    with _metrics_lock:
+        for field, inc in (
+            (f"{path}|requests|{outcome}", 1),
+            (f"{path}|retries|", retries),
+            (f"{path}|seconds_sum|", elapsed),
+            (f"{path}|seconds_count|", 1),
+        ):
+            _pending[field] = _pending.get(field, 0) + inc
+        for le in LATENCY_BUCKETS:
+            if elapsed <= le:
+                _pending[f"{path}|seconds_bucket|{le}"] = _pending.get(f"{path}|seconds_bucket|{le}", 0) + 1
+        now = time.monotonic()
+        if now - _flushed_at < settings.PAY_API_METRICS_FLUSH_SEC:
+            return
+        _flushed_at = now
+        batch = dict(_pending)
+        _pending.clear()
+    flush_metrics(batch)
+
+
+def flush_metrics(batch: Optional[Dict[str, float]] = None) -> None:
+    """Слить накопленное в Redis; не получилось — приращения вернутся в следующий слив."""
+    if batch is None:
+        with _metrics_lock:
+            batch = dict(_pending)
+            _pending.clear()
+    if not batch:
+        return
+    try:
+        pipe = _redis().pipeline(transaction=False)
+        for field, inc in batch.items():
+            if isinstance(inc, float):
+                pipe.hincrbyfloat(METRICS_KEY, field, inc)
+            else:
+                pipe.hincrby(METRICS_KEY, field, inc)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("pay-api client metrics flush failed: %s", e)
+        with _metrics_lock:
+            for field, inc in batch.items():
+                _pending[field] = _pending.get(field, 0) + inc
+
+
+def render_metrics() -> str:
+    """Сумма по всем процессам, text/plain для Prometheus."""
+    raw = _redis().hgetall(METRICS_KEY)
+    rows: Dict[str, Dict[str, float]] = {}
+    for field, value in raw.items():
+        path, name, label = field.decode().split("|", 2)
+        rows.setdefault(name, {})[f"{path}|{label}"] = float(value)
+
+    def series(name: str) -> List[tuple]:
+        return sorted((k.split("|", 1), v) for k, v in rows.get(name, {}).items())
+
+    out = [
+        "# HELP mainapp_pay_api_requests_total Calls to pay-api by outcome (ok, 5xx, error).",
+        "# TYPE mainapp_pay_api_requests_total counter",
+    ]
+    out += [f'mainapp_pay_api_requests_total{{path="{p}",outcome="{o}"}} {v:g}'
+            for (p, o), v in series("requests")]
+    out += [
+        "# HELP mainapp_pay_api_retries_total urllib3 retries of pay-api calls.",
+        "# TYPE mainapp_pay_api_retries_total counter",
+    ]
+    out += [f'mainapp_pay_api_retries_total{{path="{p}"}} {v:g}' for (p, _), v in series("retries")]
+    out += [
+        "# HELP mainapp_pay_api_request_seconds pay-api call latency, retries included.",
+        "# TYPE mainapp_pay_api_request_seconds histogram",
+    ]
+    counts = rows.get("seconds_count", {})
+    sums = rows.get("seconds_sum", {})
+    buckets = rows.get("seconds_bucket", {})
+    for key in sorted(counts):
+        p = key.split("|", 1)[0]
+        for le in LATENCY_BUCKETS:
+            out.append(f'mainapp_pay_api_request_seconds_bucket{{path="{p}",le="{le:g}"}} '
+                       f'{buckets.get(f"{p}|{le}", 0):g}')
+        out.append(f'mainapp_pay_api_request_seconds_bucket{{path="{p}",le="+Inf"}} {counts[key]:g}')
+        out.append(f'mainapp_pay_api_request_seconds_sum{{path="{p}"}} {sums.get(key, 0):g}')
+        out.append(f'mainapp_pay_api_request_seconds_count{{path="{p}"}} {counts[key]:g}')
+    return "\n".join(out) + "\n"
+
+
+def stats() -> dict:
+    lat = sorted(_latencies)
+
+    def pct(q: float) -> Optional[float]:
+        return round(lat[min(len(lat) - 1, int(q * len(lat)))] * 1000, 1) if lat else None
+
+    return {**_stats, "p50_ms": pct(0.5), "p95_ms": pct(0.95), "max_ms": pct(1.0)}
@@ -0,0 +1,121 @@
+import logging
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from payments import pay_api
+from payments.models import Payment
+
+logger = logging.getLogger(__name__)
+
+# ===== сверка зависших pending с FreeKassa =====
+# курсор (created_at, id) живёт в кэше без TTL: перезапуск продолжает с того же места,
+# пустая пачка — проход окончен, курсор сбрасываем
+CURSOR_KEY = "reconcile:cursor"
+LOCK_KEY = "reconcile:lock"
+# заказы paymentlnk (views_plnk_test.py): у FK их нет, а API статусов paymentlnk в pay-api не подключён —
+# такие pending ждут только колбэк /v2/status
+PLNK_PAYMENT_PREFIX = "plnk-"
+
+def load_cursor():
+    raw = cache.get(CURSOR_KEY)
+    if not raw:
+        return None
+    return datetime.fromisoformat(raw[0]), raw[1]
+
+
+def save_cursor(created_at: datetime, pk: int) -> None:
+    cache.set(CURSOR_KEY, (created_at.isoformat(), pk), timeout=None)
+
+
+def pending_batch(cursor, now: datetime, size: int):
+    """Следующая пачка pending FreeKassa старше RECONCILE_MIN_AGE_MIN, не старше RECONCILE_MAX_AGE_HOURS."""
+    qs = Payment.objects.filter(
+        status="pending",
+        created_at__lt=now - timedelta(minutes=settings.RECONCILE_MIN_AGE_MIN),
+        created_at__gte=now - timedelta(hours=settings.RECONCILE_MAX_AGE_HOURS),
+    ).exclude(payment_id__startswith=PLNK_PAYMENT_PREFIX)
+    if cursor:
+        c_at, c_id = cursor
+        qs = qs.filter(Q(created_at__gt=c_at) | Q(created_at=c_at, id__gt=c_id))
+    return list(qs.order_by("created_at", "id").values_list("id", "order_id", "payment_id", "created_at")[:size])
+
+
+class Throttled(Exception):
+    """pay-api ответил 429 на сверку: квота RATE_STATUS_* исчерпана, продолжим в следующий проход."""
+
+
+def fetch_statuses(payment_ids):
+    """payment_id -> ответ pay-api /internal/order_status (опрос FK с ограниченной параллельностью)."""
+    r = pay_api.post("/internal/order_status", {"payment_ids": payment_ids})
+    if r.status_code == 429:
+        raise Throttled(r.headers.get("Retry-After"))
+    r.raise_for_status()
+    return {row["payment_id"]: row for row in r.json().get("results", [])}
+
+
+def to_event(order_id: str, st: dict):
+    """Ответ FK -> событие в формате вебхука; None — менять нечего."""
+    if st.get("status") not in ("success", "failed"):
+        return None
+    return {
+        "provider": "freekassa",
+        "schema": "reconcile",
+        "order_id": order_id,
+        "amount": st.get("amount"),
+        "currency": st.get("currency"),
+        "status": st["status"],
+        "intid": st.get("fk_order_id") or "",
+    }
+
+
+def run(handle, max_batches: int) -> dict:
+    """
+    До max_batches пачек; handle(event) — тот же обработчик, что у вебхуков.
+    Курсор двигается только после обработки пачки; на 429 проход заканчиваем, курсор остаётся.
+    """
+    stats = {"checked": 0, "paid": 0, "failed": 0, "errors": 0, "batches": 0, "throttled": 0}
+    now = timezone.now()
+    cursor = load_cursor()
+    for _ in range(max_batches):
+        rows = pending_batch(cursor, now, settings.RECONCILE_BATCH)
+        if not rows:
+            cache.delete(CURSOR_KEY)
+            break
+        try:
+            statuses = fetch_statuses([payment_id for _, _, payment_id, _ in rows])
+        except Throttled as e:
+            logger.info("reconcile: pay-api throttled, retry after %ss; resuming next pass", e)
+            stats["throttled"] = 1
+            break
+        for _, order_id, payment_id, _ in rows:
+            st = statuses.get(payment_id) or {}
+            stats["checked"] += 1
+            if st.get("status") == "error":
+                stats["errors"] += 1
+            event = to_event(order_id, st)
+            if event:
+                handle(event)
+                stats["paid" if event["status"] == "success" else "failed"] += 1
+        last_id, _, _, last_at = rows[-1]
+        cursor = (last_at, last_id)
+        save_cursor(last_at, last_id)
+        stats["batches"] += 1
+    return stats
+
+
+def fail_stuck_creating() -> int:
+    """creating дольше RECONCILE_MIN_AGE_MIN — задача create_link потеряна (ретраи давно кончились)."""
+    cutoff = timezone.now() - timedelta(minutes=settings.RECONCILE_MIN_AGE_MIN)
+    return Payment.objects.filter(status="creating", created_at__lt=cutoff).update(status="create_failed")
+
+
+def acquire_lock() -> bool:
+    return cache.add(LOCK_KEY, "1", timeout=settings.RECONCILE_LOCK_SEC)
+
+
+def release_lock() -> None:
+    cache.delete(LOCK_KEY)
@@ -0,0 +1,52 @@
+import json
+import logging
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - зависит от окружения
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# ===== декодеры событий payments.events =====
+# pay-api ставит content_type и заголовок x-event-version (app/serialization.py);
+# сообщения без них — старый формат, тот же JSON v1
+EVENT_VERSION_HEADER = "x-event-version"
+DEFAULT_CONTENT_TYPE = "application/json"
+DEFAULT_VERSION = "1"
+
+Raw = Union[bytes, bytearray, memoryview, str]
+
+
+def _loads_json(raw: Raw) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+DECODERS: Dict[Tuple[str, str], Callable[[Raw], Any]] = {
+    ("application/json", "1"): _loads_json,
+}
+
+
+class UnsupportedEvent(ValueError):
+    pass
+
+
+def decode_event(
+    body: Raw,
+    content_type: Optional[str] = None,
+    headers: Optional[Mapping[str, Any]] = None,
+) -> Dict[str, Any]:
+    ctype = (content_type or DEFAULT_CONTENT_TYPE).split(";", 1)[0].strip().lower()
+    version = (headers or {}).get(EVENT_VERSION_HEADER) or DEFAULT_VERSION
+    if isinstance(version, bytes):
+        version = version.decode()
+    decoder = DECODERS.get((ctype, str(version)))
+    if decoder is None:
+        raise UnsupportedEvent(f"no decoder for {ctype} v{version}")
+    data = decoder(body)
+    if not isinstance(data, dict):
+        raise UnsupportedEvent(f"event must be an object, got {type(data).__name__}")
+    return data
@@ -1,34 +1,67 @@
+import time
+import logging
+from django.db import IntegrityError, transaction
 from django.utils import timezone
-from django.db import transaction
-from .models import SellerDayCounter, SellerCommission
+from .models import SellerCommission
 from decimal import Decimal
 from django.conf import settings
+from . import order_seq
+
+log = logging.getLogger(__name__)
+
+ORDER_ID_ATTEMPTS = 3
 
 
 def _today_local():
     return timezone.localdate()
 
 def next_order_id_for(user):
+    """Номер PFX-YYYYMMDD-NN; счётчик в Redis (payments/order_seq.py), без блокировки строки."""
     today = _today_local()
-    with transaction.atomic():
-        row, _ = SellerDayCounter.objects.select_for_update().get_or_create(
-            user=user, day=today, defaults={"last_seq":0}
-        )
-        row.last_seq += 1
-        row.save(update_fields=["last_seq"])
-        prefix = user.seller.order_prefix
-        order_id = f"{prefix}-{today.strftime('%Y%m%d')}-{row.last_seq:02d}"
-        return order_id, row.last_seq, prefix, today
-    
+    prefix = user.seller.order_prefix
+    seq = order_seq.allocate(user, prefix, today)
+    _preview_cache.pop(user.pk, None)
+    order_id = f"{prefix}-{today.strftime('%Y%m%d')}-{seq:02d}"
+    return order_id, seq, prefix, today
+
+
+def create_with_order_id(user, create):
+    """
+    Берёт номер и вызывает create(order_id, seq, prefix, day) в своей транзакции.
+    Номер уже занят (Redis потерял счётчик между write-back) — догоняем БД и повторяем с новым.
+    """
+    for attempt in range(ORDER_ID_ATTEMPTS):
+        order_id, seq, prefix, day = next_order_id_for(user)
+        try:
+            with transaction.atomic():
+                return create(order_id, seq, prefix, day)
+        except IntegrityError:
+            log.warning("order id %s already taken, resyncing sequence", order_id)
+            order_seq.resync(user, prefix, day)
+            if attempt == ORDER_ID_ATTEMPTS - 1:
+                raise
+
+
+# превью номера: кэш на процесс на ORDER_PREVIEW_CACHE_SEC, открытие формы не ходит ни в Redis, ни в БД;
+# user_id -> (до какого monotonic, префикс, день, последний номер)
+_preview_cache = {}
+_PREVIEW_CACHE_MAX = 10000
 
 
 def preview_next_order_id_for(user):
+    """Только чтение: номер, который скорее всего получит следующая ссылка. Ничего не резервирует."""
     today = _today_local()
-    row, _ = SellerDayCounter.objects.get_or_create(
-        user=user, day=today, defaults={"last_seq": 0}
-    )
-    prefix = user.seller.order_prefix
-    next_seq = row.last_seq + 1
+    now = time.monotonic()
+    hit = _preview_cache.get(user.pk)
+    if hit and hit[0] > now and hit[2] == today:
+        _, prefix, _, last = hit
+    else:
+        prefix = user.seller.order_prefix
+        last = order_seq.peek(user, prefix, today)
+        if len(_preview_cache) >= _PREVIEW_CACHE_MAX:
+            _preview_cache.clear()
+        _preview_cache[user.pk] = (now + settings.ORDER_PREVIEW_CACHE_SEC, prefix, today, last)
+    next_seq = last + 1
     order_id = f"{prefix}-{today.strftime('%Y%m%d')}-{next_seq:02d}"
     return order_id, next_seq, prefix, today
 
@@ -1,9 +1,11 @@
-import os, json, logging, decimal, requests
+import os, logging, decimal, requests
 from celery import shared_task
 from django.utils import timezone
 from django.db import transaction
 from django.core.cache import cache
+from django.conf import settings
 from payments.models import Payment
+from payments.serialization import decode_event
 from payments.services import get_effective_commission_from_profile
 from accounts.models import TelegramAccount
 
@@ -67,7 +69,8 @@ def notify_payment_paid(self, payment_id: int):
 
 @shared_task(bind=True, name="payments.handle_event")
 def handle_payment_event(self, body):
-    data = json.loads(body) if isinstance(body, str) else body
+    # listener передаёт уже разобранный dict; строка/байты — старые задачи в очереди Celery
+    data = body if isinstance(body, dict) else decode_event(body)
     order_id = data.get("order_id")
     status = (data.get("status") or "").lower()
     intid = (data.get("intid") or "")
@@ -120,4 +123,67 @@ def handle_payment_event(self, body):
         else:
             p.save(update_fields=["status"])
 
-    logger.info("Payment %s => %s (intid=%s)", order_id, p.status, intid)
\ No newline at end of file
+    logger.info("Payment %s => %s (intid=%s)", order_id, p.status, intid)
+
+
+@shared_task(bind=True, name="payments.reconcile_pending", ignore_result=True)
+def reconcile_pending(self):
+    """Периодически (CELERY_BEAT_SCHEDULE): pending без вебхука сверяем со статусом в FreeKassa."""
+    from payments import reconcile
+
+    if not reconcile.acquire_lock():
+        logger.info("reconcile_pending: previous run still active, skip")
+        return
+    try:
+        stuck = reconcile.fail_stuck_creating()
+        if stuck:
+            logger.warning("reconcile_pending: %s links stuck in creating -> create_failed", stuck)
+        stats = reconcile.run(handle_payment_event, settings.RECONCILE_MAX_BATCHES)
+    except requests.RequestException as e:
+        logger.warning("reconcile_pending: pay-api unavailable: %s", e)
+        return
+    finally:
+        reconcile.release_lock()
+    logger.info("reconcile_pending: %s", stats)
+
+
+@shared_task(bind=True, name="payments.create_link", ignore_result=True,
+             max_retries=settings.PAY_LINK_MAX_RETRIES)
+def create_payment_link(self, payment_id: int, ttl_minutes: int):
+    """
+    Фоновое создание ссылки для Payment в статусе creating (CreateLinkForm.save_async).
+    Ключ идемпотентности выводится из order_id, поэтому ретраи не заводят второй заказ у провайдера.
+    """
+    from payments.forms import request_pay_link, expires_from
+
+    p = Payment.objects.filter(id=payment_id, status="creating").first()
+    if p is None:
+        return
+    try:
+        data = request_pay_link(
+            order_id=p.order_id,
+            amount=p.amount,
+            email=p.email,
+            method=p.method,
+            comment=p.comment,
+            ttl_minutes=ttl_minutes,
+        )
+    except requests.RequestException as e:
+        resp = getattr(e, "response", None)
+        # 4xx (кроме 429) — повтор не поможет
+        final = resp is not None and 400 <= resp.status_code < 500 and resp.status_code != 429
+        if not final and self.request.retries < self.max_retries:
+            raise self.retry(exc=e, countdown=2 ** self.request.retries)
+        logger.warning("create_link %s failed: %s", p.order_id, e)
+        Payment.objects.filter(id=p.id, status="creating").update(status="create_failed")
+        return
+
+    Payment.objects.filter(id=p.id, status="creating").update(
+        status="pending",
+        payment_id=data["payment_id"],
+        token=data["token"],
+        fk_url=data["fk_url"],
+        public_url=data["public_url"],
+        expires_at=expires_from(data, ttl_minutes),
+    )
+    logger.info("create_link %s ready", p.order_id)
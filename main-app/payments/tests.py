@@ -1,3 +1,208 @@
-from django.test import TestCase
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import redis
+import requests
+from celery.exceptions import Retry
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import SellerProfile
+from . import order_seq
+from .forms import _enqueue_create_link
+from .models import Payment, SellerDayCounter
+from .services import create_with_order_id, next_order_id_for
+from .tasks import create_payment_link
+
+PREFIX = "ZQT"
+THREADS = 6
+PER_THREAD = 15
+
+
+def _create(user):
+    def create(order_id, seq, prefix, day):
+        return Payment.objects.create(
+            user=user,
+            payment_id=f"test-{order_id}",
+            token=f"test-{order_id}",
+            fk_url="",
+            public_url="",
+            amount="10.00",
+            email="buyer@example.com",
+            method=44,
+            expires_at=timezone.now() + timezone.timedelta(hours=1),
+            order_prefix=prefix,
+            order_date=day,
+            order_seq=seq,
+            order_id=order_id,
+        )
+    return create
+
+
+# ===== номера заказов: Redis hi/lo + SellerDayCounter (payments/order_seq.py) =====
+# Нужны Postgres (select_for_update, параллельные соединения) и Redis из REDIS_URL.
+@skipUnless(connection.vendor == "postgresql", "order_seq concurrency needs PostgreSQL")
+@override_settings(ORDER_SEQ_BLOCK=1, ORDER_SEQ_WRITEBACK=5)
+class OrderSeqTests(TransactionTestCase):
+    def setUp(self):
+        try:
+            order_seq._redis().ping()
+        except redis.RedisError as e:
+            self.skipTest(f"Redis unavailable: {e}")
+        self.user = get_user_model().objects.create_user("seller", "seller@example.com", "x")
+        SellerProfile.objects.create(user=self.user, order_prefix=PREFIX)
+        self.day = timezone.localdate()
+        self.key = order_seq.seq_key(PREFIX, self.day)
+        self._clear_redis()
+        self.addCleanup(self._clear_redis)
+
+    def _clear_redis(self):
+        order_seq._redis().delete(self.key, f"{self.key}:limit")
+        order_seq._blocks.clear()
+
+    def _limit(self) -> int:
+        return int(order_seq._redis().hget(f"{self.key}:limit", "limit") or 0)
+
+    def test_concurrent_numbers_are_unique(self):
+        start = threading.Barrier(THREADS)
+
+        def worker(_):
+            try:
+                start.wait()
+                return [create_with_order_id(self.user, _create(self.user)).order_seq for _ in range(PER_THREAD)]
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(THREADS) as pool:
+            seqs = [s for chunk in pool.map(worker, range(THREADS)) for s in chunk]
+
+        self.assertEqual(len(seqs), THREADS * PER_THREAD)
+        self.assertEqual(len(set(seqs)), len(seqs))
+        # high-water mark в БД покрывает всё, что выдал Redis
+        last_seq = SellerDayCounter.objects.get(user=self.user, day=self.day).last_seq
+        self.assertGreaterEqual(last_seq, max(seqs))
+        self.assertGreaterEqual(last_seq, self._limit())
+
+    def test_limit_raised_only_after_commit(self):
+        with transaction.atomic():
+            _, seq, _, _ = next_order_id_for(self.user)
+            last_seq = SellerDayCounter.objects.get(user=self.user, day=self.day).last_seq
+            self.assertGreaterEqual(last_seq, seq)
+            self.assertEqual(self._limit(), 0)
+        self.assertEqual(self._limit(), last_seq)
+
+    def test_rolled_back_window_is_not_served_by_redis(self):
+        try:
+            with transaction.atomic():
+                next_order_id_for(self.user)
+                raise RuntimeError("rollback")
+        except RuntimeError:
+            pass
+        self.assertEqual(self._limit(), 0)
+        self.assertFalse(SellerDayCounter.objects.filter(user=self.user, day=self.day).exists())
+        # следующий номер снова продлевает окно под блокировкой строки
+        _, seq, _, _ = next_order_id_for(self.user)
+        self.assertEqual(seq, 2)
+        self.assertEqual(self._limit(), SellerDayCounter.objects.get(user=self.user, day=self.day).last_seq)
+
+    def test_taken_number_is_resynced(self):
+        for _ in range(3):
+            create_with_order_id(self.user, _create(self.user))
+        # Redis откатился (восстановление из старого снапшота): номер 2 уже в БД
+        order_seq._redis().set(self.key, 1)
+
+        p = create_with_order_id(self.user, _create(self.user))
+
+        self.assertGreater(p.order_seq, 3)
+        self.assertEqual(Payment.objects.filter(user=self.user).count(), 4)
+
+
+# ===== фоновое создание ссылки (payments.create_link) =====
+LINK = {
+    "payment_id": "pay-1",
+    "token": "tok-1",
+    "fk_url": "https://pay.example.com/fk",
+    "public_url": "https://pay.example.com/p/tok-1",
+}
+
+
+def _http_error(status: int) -> requests.HTTPError:
+    resp = requests.Response()
+    resp.status_code = status
+    return requests.HTTPError(f"{status}", response=resp)
+
+
+class CreatePaymentLinkTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user("seller", "seller@example.com", "x")
+        self.payment = Payment.objects.create(
+            user=user,
+            payment_id="creating:1",
+            token="creating:1",
+            fk_url="",
+            public_url="",
+            amount="10.00",
+            email="buyer@example.com",
+            method=44,
+            status="creating",
+            expires_at=timezone.now() + timezone.timedelta(hours=1),
+            order_prefix=PREFIX,
+            order_date=timezone.localdate(),
+            order_seq=1,
+            order_id=f"{PREFIX}-1",
+        )
+        patcher = mock.patch("payments.forms.request_pay_link")
+        self.request_pay_link = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _status(self) -> str:
+        self.payment.refresh_from_db()
+        return self.payment.status
+
+    def test_success_sets_pending(self):
+        self.request_pay_link.return_value = LINK
+
+        create_payment_link.apply(args=(self.payment.id, 30))
+
+        self.assertEqual(self._status(), "pending")
+        self.assertEqual(self.payment.token, "tok-1")
+        self.assertEqual(self.payment.public_url, LINK["public_url"])
+
+    def test_client_error_is_final(self):
+        self.request_pay_link.side_effect = _http_error(400)
+
+        with mock.patch.object(create_payment_link, "retry") as retry:
+            create_payment_link.apply(args=(self.payment.id, 30))
+
+        retry.assert_not_called()
+        self.assertEqual(self._status(), "create_failed")
+
+    def test_server_error_and_429_are_retried(self):
+        for status in (503, 429):
+            with self.subTest(status=status):
+                self.request_pay_link.side_effect = _http_error(status)
+
+                with mock.patch.object(create_payment_link, "retry", side_effect=Retry()) as retry:
+                    create_payment_link.apply(args=(self.payment.id, 30))
+
+                retry.assert_called_once()
+                self.assertEqual(self._status(), "creating")
+
+    def test_last_retry_marks_failed(self):
+        self.request_pay_link.side_effect = _http_error(503)
+
+        create_payment_link.apply(args=(self.payment.id, 30), retries=create_payment_link.max_retries)
+
+        self.assertEqual(self._status(), "create_failed")
+
+    def test_inline_fallback_makes_single_attempt(self):
+        self.request_pay_link.side_effect = _http_error(503)
+
+        with mock.patch.object(create_payment_link, "delay", side_effect=ConnectionError("broker down")):
+            _enqueue_create_link(create_payment_link, self.payment.id, 30)
+
+        self.assertEqual(self.request_pay_link.call_count, 1)
+        self.assertEqual(self._status(), "create_failed")
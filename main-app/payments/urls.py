@@ -1,11 +1,15 @@
 from django.urls import path
-from .views import generate_link, bot_create_link, preview_order_id, tags_list_create
+from .views import (generate_link, bot_create_link, preview_order_id, tags_list_create,
+                    link_status, bot_link_status, pay_api_metrics)
 
 urlpatterns = [
     path("generate-link/", generate_link, name="generate_link"),
     path('api/bot/create_link/', bot_create_link, name='bot_create_link'),
+    path("link-status/<str:order_id>/", link_status, name="link_status"),
+    path("api/bot/link_status/<str:order_id>/", bot_link_status, name="bot_link_status"),
     path("preview-order-id/", preview_order_id, name="preview-order-id"),
     path("api/tags/", tags_list_create, name="tags_list_create"),
+    path("internal/pay_api_metrics/", pay_api_metrics, name="pay_api_metrics"),
 ]
 
 
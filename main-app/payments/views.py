@@ -1,18 +1,25 @@
-from django.http import JsonResponse, HttpResponseForbidden, HttpResponseBadRequest
+import hmac
+
+import redis
+from django.http import HttpResponse, JsonResponse, HttpResponseForbidden, HttpResponseBadRequest
 from django.views.decorators.http import require_GET, require_POST, require_http_methods
+from django.views.decorators.cache import cache_control
 from django.contrib.auth.decorators import login_required
 from .forms import CreateLinkForm
 import logging
 from .services import next_order_id_for, preview_next_order_id_for
-from .models import Tag
+from . import pay_api
+from .models import Payment, Tag
 logger = logging.getLogger(__name__)
 import random
 import json
 from django.utils.text import slugify
+from django.urls import reverse
 
 from accounts.models import TelegramAccount
 
-from core.models import PaymentMethod
+from core import payment_methods
+from core.ratelimit import seller_limiter, telegram_limiter, too_many_requests
 
 
 @login_required
@@ -22,26 +29,61 @@ def generate_link(request):
     if not form.is_valid():
         return JsonResponse({"ok": False, "errors": form.errors}, status=400)
 
+    wait = seller_limiter.acquire(request.user.id)
+    if wait:
+        return too_many_requests(wait)
+
     try:
+        if settings.PAY_LINK_ASYNC:
+            payment = form.save_async(request.user)
+            return JsonResponse(_creating_json(payment, reverse("link_status", args=[payment.order_id])),
+                                status=202)
         payment = form.save(request.user)
-        return JsonResponse({
-            "ok": True,
-            "order_id": payment.order_id,
-            "public_url": payment.public_url,
-            "fk_url": payment.fk_url,
-            "amount": str(payment.amount),
-            "method": payment.method,
-            "comment": payment.comment,
-            "tag_id": payment.tag_obj_id,
-            "tag_name": payment.tag_obj.name if payment.tag_obj_id else None,
-            "tag": payment.tag,
-            "expires_at": payment.expires_at.isoformat(),
-        })
+        return JsonResponse(_link_json(payment))
     except Exception as e:
         logger.exception("Ошибка при генерации ссылки: %s", e)
         return JsonResponse({"ok": False, "error": str(e)}, status=500)
 
 
+def _link_json(p) -> dict:
+    return {
+        "ok": True,
+        "status": p.status,
+        "order_id": p.order_id,
+        "public_url": p.public_url,
+        "fk_url": p.fk_url,
+        "amount": str(p.amount),
+        "method": p.method,
+        "comment": p.comment,
+        "tag_id": p.tag_obj_id,
+        "tag_name": p.tag_obj.name if p.tag_obj_id else None,
+        "tag": p.tag,
+        "expires_at": p.expires_at.isoformat(),
+    }
+
+
+def _creating_json(p, status_url: str) -> dict:
+    return {"ok": True, "status": p.status, "order_id": p.order_id, "status_url": status_url}
+
+
+def _status_response(p) -> JsonResponse:
+    """creating — ещё ждём pay-api, create_failed — ссылку создать не удалось."""
+    if p.status == "creating":
+        return JsonResponse({"ok": True, "status": p.status, "order_id": p.order_id})
+    if p.status == "create_failed":
+        return JsonResponse({"ok": False, "status": p.status, "order_id": p.order_id,
+                             "error": "Не удалось создать ссылку, попробуйте ещё раз"})
+    return JsonResponse(_link_json(p))
+
+
+@require_GET
+@login_required
+def link_status(request, order_id):
+    p = Payment.objects.select_related("tag_obj").filter(user=request.user, order_id=order_id).first()
+    if p is None:
+        return JsonResponse({"ok": False, "error": "not found"}, status=404)
+    return _status_response(p)
+
 
 
 import json
@@ -63,6 +105,11 @@ def bot_create_link(request):
     except ValueError:
         return HttpResponseBadRequest("bad telegram id")
 
+    # до запросов в БД: скрипт, долбящий бота, не должен съесть квоту провайдера
+    wait = telegram_limiter.acquire(tg_id)
+    if wait:
+        return too_many_requests(wait)
+
     try:
         tg = TelegramAccount.objects.select_related("user").get(telegram_id=tg_id)
     except TelegramAccount.DoesNotExist:
@@ -81,22 +128,22 @@ def bot_create_link(request):
 
     # 2) кандидаты, которые точно работают в RUB у Pay API
     RUB_PREFERRED = [44, 36]  # СБП, Карты
-    # 3) берём дефолт из БД (если активен)
-    default_pm = PaymentMethod.objects.filter(is_active=True, is_default=True).first()
+    # 3) берём дефолт из реестра (если активен)
+    default_id = payment_methods.default_id()
 
     # 4) выбираем итоговый метод:
     pm_id = None
-    if forced_method and PaymentMethod.objects.filter(id=forced_method, is_active=True).exists():
+    if forced_method and payment_methods.is_active(forced_method):
         pm_id = forced_method
-    elif default_pm and default_pm.id in RUB_PREFERRED:
-        pm_id = default_pm.id
+    elif default_id in RUB_PREFERRED:
+        pm_id = default_id
     else:
         # первый активный из «белого списка»
-        cand = PaymentMethod.objects.filter(is_active=True, id__in=RUB_PREFERRED).order_by("sort","id").first()
+        cand = next((m for m in payment_methods.active() if m.id in RUB_PREFERRED), None)
         if cand:
             pm_id = cand.id
-        elif default_pm:
-            pm_id = default_pm.id  # последний шанс — что есть
+        elif default_id:
+            pm_id = default_id  # последний шанс — что есть
 
     if not pm_id:
         return JsonResponse({"ok": False, "error": "no active payment methods"}, status=500)
@@ -115,28 +162,52 @@ def bot_create_link(request):
         return JsonResponse({"ok": False, "errors": form.errors}, status=400)
 
     try:
+        if settings.PAY_LINK_ASYNC:
+            p = form.save_async(tg.user)
+            return JsonResponse(_creating_json(p, reverse("bot_link_status", args=[p.order_id])), status=202)
         p = form.save(tg.user)
     except Exception as e:
         logger.exception("bot_create_link error: %s", e)
         return JsonResponse({"ok": False, "error": str(e)}, status=500)
 
-    return JsonResponse({
-        "ok": True,
-        "order_id": p.order_id,
-        "public_url": p.public_url,
-        "fk_url": p.fk_url,
-        "amount": str(p.amount),
-        "method": p.method,
-        "comment": p.comment,
-        "expires_at": p.expires_at.isoformat(),
-    })
+    return JsonResponse(_link_json(p))
+
+
+@require_GET
+def bot_link_status(request, order_id):
+    token = request.headers.get("X-Bot-Token", "")
+    if not settings.BOT_INTERNAL_TOKEN or token != settings.BOT_INTERNAL_TOKEN:
+        return HttpResponseForbidden("forbidden")
+    try:
+        tg_id = int(request.headers.get("X-Telegram-Id", "0"))
+    except ValueError:
+        return HttpResponseBadRequest("bad telegram id")
 
+    p = (Payment.objects.select_related("tag_obj")
+         .filter(user__tg__telegram_id=tg_id, order_id=order_id).first())
+    if p is None:
+        return JsonResponse({"ok": False, "error": "not found"}, status=404)
+    return _status_response(p)
 
 
+@require_GET
+def pay_api_metrics(request):
+    """Метрики клиента pay-api со всех процессов (payments/pay_api.py) для Prometheus."""
+    token = request.headers.get("X-Internal-Token", "")
+    if not settings.PAY_INTERNAL_TOKEN or not hmac.compare_digest(token, settings.PAY_INTERNAL_TOKEN):
+        return HttpResponseForbidden("forbidden")
+    pay_api.flush_metrics()
+    try:
+        body = pay_api.render_metrics()
+    except redis.RedisError as e:
+        logger.warning("pay_api_metrics: Redis unavailable: %s", e)
+        return HttpResponse("redis unavailable\n", status=503, content_type="text/plain")
+    return HttpResponse(body, content_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 @require_GET
 @login_required
+@cache_control(private=True, max_age=settings.ORDER_PREVIEW_CACHE_SEC)
 def preview_order_id(request):
     oid, seq, prefix, day = preview_next_order_id_for(request.user)
     return JsonResponse({
@@ -1,6 +1,5 @@
 # payments/views_plnk_test.py
 import logging
-import httpx
 import uuid
 from decimal import Decimal
 
@@ -11,12 +10,13 @@ from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 
 from .models import Payment
-from payments.services import next_order_id_for
+from payments.services import create_with_order_id
+from payments import pay_api
 
 logger = logging.getLogger(__name__)
 
-PAY_SERVICE_URL = "http://pay-api:8000/v2/internal/create_link"
-PLNK_41_URL     = "http://pay-api:8000/v2/internal/create_start_link"
+PAY_SERVICE_PATH = "/v2/internal/create_link"
+PLNK_41_PATH     = "/v2/internal/create_start_link"
 INTERNAL_TOKEN  = getattr(settings, "PAY_INTERNAL_TOKEN", "")
 
 
@@ -49,34 +49,34 @@ def create_plnk_test_link(request):
         print("PLNK_TEST: BAD AMOUNT ERROR:", repr(e))
         return HttpResponseBadRequest("bad amount")
 
-    order_id, seq, prefix, day = next_order_id_for(request.user)
-    print(
-        "PLNK_TEST: next_order_id_for ->",
-        "order_id=", order_id,
-        "seq=", seq,
-        "prefix=", prefix,
-        "day=", day,
-    )
+    def create(order_id, seq, prefix, day):
+        print(
+            "PLNK_TEST: next_order_id_for ->",
+            "order_id=", order_id,
+            "seq=", seq,
+            "prefix=", prefix,
+            "day=", day,
+        )
+        return Payment.objects.create(
+            user=request.user,
+            order_id=order_id,
+            order_seq=seq,
+            order_prefix=prefix,
+            order_date=day,
+            payment_id=f"plnk-{order_id}",
+            # генерим уникальный токен, чтобы не ловить UNIQUE CONSTRAINT на token
+            token=f"plnk-{uuid.uuid4().hex}",
+            fk_url="",
+            public_url="",
+            amount=amount,
+            email=email,
+            method=999,
+            comment=request.POST.get("comment") or "PLNK TEST",
+            expires_at=timezone.now() + timezone.timedelta(hours=24),
+        )
 
-    # генерим уникальный токен, чтобы не ловить UNIQUE CONSTRAINT на token
-    initial_token = f"plnk-{uuid.uuid4().hex}"
-
-    p = Payment.objects.create(
-        user=request.user,
-        order_id=order_id,
-        order_seq=seq,
-        order_prefix=prefix,
-        order_date=day,
-        payment_id=f"plnk-{order_id}",
-        token=initial_token,
-        fk_url="",
-        public_url="",
-        amount=amount,
-        email=email,
-        method=999,
-        comment=request.POST.get("comment") or "PLNK TEST",
-        expires_at=timezone.now() + timezone.timedelta(hours=24),
-    )
+    p = create_with_order_id(request.user, create)
+    order_id = p.order_id
     print("PLNK_TEST: Payment created, id=", p.id, "payment_id=", p.payment_id, "token=", p.token)
 
     ttl_raw = request.POST.get("ttl_minutes")
@@ -94,18 +94,18 @@ def create_plnk_test_link(request):
     }
 
     print("PLNK_TEST: PAYLOAD TO PAY-API:", payload)
-    print("PLNK_TEST: PAY_SERVICE_URL:", PAY_SERVICE_URL)
+    print("PLNK_TEST: PAY_SERVICE_PATH:", PAY_SERVICE_PATH)
 
     try:
-        with httpx.Client(timeout=10.0) as client:
-            resp = client.post(
-                PAY_SERVICE_URL,
-                json=payload,
-                headers={"X-Internal-Token": INTERNAL_TOKEN},
-            )
+        resp = pay_api.post(
+            PAY_SERVICE_PATH,
+            payload,
+            idem=pay_api.idempotency_key(p.payment_id),
+            timeout=10.0,
+        )
     except Exception as e:
-        print("PLNK_TEST: httpx EXCEPTION:", repr(e))
-        logger.exception("PLNK create link error (httpx): %s", e)
+        print("PLNK_TEST: pay-api EXCEPTION:", repr(e))
+        logger.exception("PLNK create link error: %s", e)
         return JsonResponse({"ok": False, "error": "service unreachable"}, status=502)
 
     print("PLNK_TEST: pay-api RESP STATUS:", resp.status_code)
@@ -143,7 +143,7 @@ def create_plnk_test_link(request):
         p.token = api_token
     else:
         # если не вернул — оставляем сгенерированный initial_token
-        print("PLNK_TEST: pay-api did not return token, keep initial_token:", initial_token)
+        print("PLNK_TEST: pay-api did not return token, keep initial_token:", p.token)
 
     p.public_url = data.get("public_url") or ""
     p.fk_url = data.get("plnk_url") or data.get("fk_url") or ""
@@ -0,0 +1,120 @@
+# breaker.py
+import time
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Any
+
+from .metrics import BREAKER_STATE
+
+logger = logging.getLogger("uvicorn.error")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+_STATE_VALUE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+@dataclass(frozen=True)
+class BreakerConfig:
+    """Пороги breaker'а и адаптивного таймаута; значения — из Settings."""
+
+    failures: int = 5
+    open_sec: float = 30.0
+    half_open_probes: int = 1
+    timeout_min: float = 2.0
+    timeout_mult: float = 3.0
+    timeout_pct: float = 0.99
+    window: int = 200
+    min_samples: int = 20
+
+
+class CircuitOpen(Exception):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} circuit is open")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    closed -> (N отказов подряд) -> open -> (пауза) -> half_open -> (проба ок) -> closed.
+    Таймаут запроса подстраивается под p99 последних успешных ответов провайдера.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_timeout: float,
+        cfg: BreakerConfig = BreakerConfig(),
+    ):
+        self.name = name
+        self.max_timeout = max_timeout
+        self.cfg = cfg
+        self.failure_threshold = cfg.failures
+        self.open_sec = cfg.open_sec
+        self.half_open_probes = cfg.half_open_probes
+
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._latencies: Deque[float] = deque(maxlen=cfg.window)
+        self.rejected = 0
+        BREAKER_STATE.labels(name).set(0)
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            logger.warning("Circuit %s: %s -> %s", self.name, self.state, state)
+            self.state = state
+            BREAKER_STATE.labels(self.name).set(_STATE_VALUE[state])
+
+    def before_call(self) -> None:
+        """Бросает CircuitOpen, если провайдера сейчас трогать нельзя."""
+        if self.state == OPEN:
+            left = self.open_sec - (time.monotonic() - self._opened_at)
+            if left > 0:
+                self.rejected += 1
+                raise CircuitOpen(self.name, left)
+            self._set_state(HALF_OPEN)
+            self._probes = 0
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_probes:
+                self.rejected += 1
+                raise CircuitOpen(self.name, self.open_sec)
+            self._probes += 1
+
+    def on_success(self, latency_sec: float) -> None:
+        self._latencies.append(latency_sec)
+        self._failures = 0
+        if self.state != CLOSED:
+            self._set_state(CLOSED)
+
+    def on_failure(self) -> None:
+        self._failures += 1
+        if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+            self._set_state(OPEN)
+
+    def on_abort(self) -> None:
+        """Вызов отменён без результата — освобождаем слот пробы."""
+        if self.state == HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def timeout(self) -> float:
+        """Read-таймаут: p99 * множитель в рамках [min, max]; пока мало замеров — max."""
+        if len(self._latencies) < self.cfg.min_samples:
+            return self.max_timeout
+        ordered = sorted(self._latencies)
+        idx = min(len(ordered) - 1, int(len(ordered) * self.cfg.timeout_pct))
+        t = ordered[idx] * self.cfg.timeout_mult
+        return max(self.cfg.timeout_min, min(self.max_timeout, t))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "timeout_sec": round(self.timeout(), 3),
+            "samples": len(self._latencies),
+            "rejected": self.rejected,
+        }
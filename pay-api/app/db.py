@@ -0,0 +1,134 @@
+# db.py
+import logging
+from typing import Optional, List
+
+import aiopg
+
+logger = logging.getLogger("uvicorn.error")
+
+# произвольный ключ advisory-lock: реплики не гоняют DDL одновременно
+_SCHEMA_LOCK_KEY = 80710001
+
+SCHEMA: List[str] = [
+    """
+    CREATE TABLE IF NOT EXISTS payment_outbox (
+        id              BIGSERIAL PRIMARY KEY,
+        event_key       TEXT,
+        body            TEXT NOT NULL,
+        attempts        INTEGER NOT NULL DEFAULT 0,
+        last_error      TEXT,
+        created_at      TIMESTAMPTZ NOT NULL DEFAULT now(),
+        next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        published_at    TIMESTAMPTZ
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS payment_outbox_pending_idx
+        ON payment_outbox (next_attempt_at, id)
+        WHERE published_at IS NULL
+    """,
+    # event_key:status вебхука — вставка дубля ничего не делает (NULL у старых строк не конфликтует)
+    "ALTER TABLE payment_outbox ADD COLUMN IF NOT EXISTS dedup_key TEXT",
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS payment_outbox_dedup_key_uidx
+        ON payment_outbox (dedup_key)
+    """,
+    # ===== журнал заказов (ledger.py) =====
+    """
+    CREATE TABLE IF NOT EXISTS payment_orders (
+        payment_id        TEXT PRIMARY KEY,
+        provider          TEXT NOT NULL,
+        provider_order_id TEXT,
+        amount            NUMERIC(14, 2),
+        currency          TEXT,
+        pay_url           TEXT,
+        link_token        TEXT,
+        link_expires_at   TIMESTAMPTZ,
+        status            TEXT NOT NULL DEFAULT 'created',
+        created_at        TIMESTAMPTZ NOT NULL DEFAULT now(),
+        updated_at        TIMESTAMPTZ NOT NULL DEFAULT now(),
+        paid_at           TIMESTAMPTZ
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS payment_orders_status_idx
+        ON payment_orders (status, created_at)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS payment_webhook_receipts (
+        id          BIGSERIAL PRIMARY KEY,
+        payment_id  TEXT NOT NULL,
+        provider    TEXT NOT NULL,
+        schema      TEXT NOT NULL,
+        event_key   TEXT,
+        status      TEXT,
+        amount      NUMERIC(14, 2),
+        currency    TEXT,
+        result      TEXT NOT NULL,
+        raw         JSONB,
+        received_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS payment_webhook_receipts_payment_idx
+        ON payment_webhook_receipts (payment_id, id)
+    """,
+]
+
+
+class Database:
+    """Пул aiopg к db-pay. Без DATABASE_URL всё, что на нём висит, отключается."""
+
+    def __init__(self, dsn: Optional[str], pool_min: int = 1, pool_max: int = 10, connect_timeout: int = 5):
+        self.dsn = dsn
+        self.pool_min = pool_min
+        self.pool_max = pool_max
+        self.connect_timeout = connect_timeout
+        self.pool: Optional[aiopg.Pool] = None
+        self._prepared: List[str] = []
+
+    def prepare(self, statement: str) -> None:
+        """PREPARE ... — выполняется на каждом новом соединении пула (до start())."""
+        self._prepared.append(statement)
+
+    async def _on_connect(self, conn: aiopg.Connection) -> None:
+        async with conn.cursor() as cur:
+            for stmt in self._prepared:
+                await cur.execute(stmt)
+
+    @property
+    def enabled(self) -> bool:
+        return self.pool is not None
+
+    async def start(self) -> None:
+        if not self.dsn:
+            logger.info("DATABASE_URL not set — db-pay features disabled")
+            return
+        # схема — до пула: PREPARE в on_connect ссылается на таблицы
+        await self._migrate()
+        self.pool = await aiopg.create_pool(
+            self.dsn,
+            minsize=self.pool_min,
+            maxsize=self.pool_max,
+            enable_hstore=False,
+            connect_timeout=self.connect_timeout,
+            on_connect=self._on_connect if self._prepared else None,
+        )
+        logger.info("db-pay pool started (min=%s, max=%s)", self.pool_min, self.pool_max)
+
+    async def _migrate(self) -> None:
+        async with aiopg.connect(self.dsn, enable_hstore=False, connect_timeout=self.connect_timeout) as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("SELECT pg_advisory_lock(%s)", (_SCHEMA_LOCK_KEY,))
+                try:
+                    for stmt in SCHEMA:
+                        await cur.execute(stmt)
+                finally:
+                    await cur.execute("SELECT pg_advisory_unlock(%s)", (_SCHEMA_LOCK_KEY,))
+
+    async def close(self) -> None:
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
+
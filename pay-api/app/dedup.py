@@ -0,0 +1,63 @@
+# dedup.py
+import logging
+from typing import Dict
+
+import redis.asyncio as redis
+
+from .metrics import REDIS_LATENCY
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class WebhookDedup:
+    """
+    Дедуп вебхуков на входе: SET NX EX по ключу события.
+    Повтор того же колбэка не доходит ни до outbox, ни до Celery.
+
+    claim() ставит короткую отметку (claim_sec): под убили между claim и outbox —
+    ретрай провайдера пройдёт. На полное окно её продлевает confirm() после
+    сохранения события. Окончательный дедуп — уникальный dedup_key в payment_outbox.
+    """
+
+    def __init__(
+        self,
+        redis_cli: redis.Redis,
+        window_sec: int = 86400,
+        claim_sec: int = 60,
+        prefix: str = "whdedup:",
+    ):
+        self.redis = redis_cli
+        self.window_sec = window_sec
+        self.claim_sec = claim_sec
+        self.prefix = prefix
+        self.stats: Dict[str, int] = {"accepted": 0, "duplicates": 0, "errors": 0}
+
+    async def claim(self, key: str) -> bool:
+        """True — событие новое (или Redis недоступен), False — дубль."""
+        try:
+            with REDIS_LATENCY.labels("dedup_claim").time():
+                fresh = await self.redis.set(self.prefix + key, "1", nx=True, ex=self.claim_sec)
+        except Exception as e:
+            # лучше пропустить дубль дальше (там своя идемпотентность), чем потерять оплату
+            self.stats["errors"] += 1
+            logger.warning("Webhook dedup unavailable for %s: %s", key, e)
+            return True
+        if fresh:
+            self.stats["accepted"] += 1
+            return True
+        self.stats["duplicates"] += 1
+        return False
+
+    async def confirm(self, key: str) -> None:
+        """Событие сохранено: отметка живёт всё окно дедупа."""
+        try:
+            await self.redis.set(self.prefix + key, "1", ex=self.window_sec)
+        except Exception as e:
+            logger.warning("Webhook dedup confirm failed for %s: %s", key, e)
+
+    async def release(self, key: str) -> None:
+        """Снимаем отметку, если событие так и не удалось сохранить — ретрай провайдера должен пройти."""
+        try:
+            await self.redis.delete(self.prefix + key)
+        except Exception as e:
+            logger.warning("Webhook dedup release failed for %s: %s", key, e)
@@ -0,0 +1,127 @@
+# http_clients.py
+import time
+import logging
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Optional, Dict
+
+import httpx
+
+from .breaker import BreakerConfig, CircuitBreaker, CircuitOpen
+from .metrics import PROVIDER_LATENCY, PROVIDER_REJECTED, status_class
+
+logger = logging.getLogger("uvicorn.error")
+
+
+# таймауты по умолчанию: connect / read (сек); read — потолок для адаптивного таймаута
+DEFAULT_TIMEOUTS: Dict[str, httpx.Timeout] = {
+    "freekassa": httpx.Timeout(15.0, connect=5.0),
+    "paymentlnk": httpx.Timeout(15.0, connect=5.0),
+}
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _no_cookies() -> CookieJar:
+    # клиент общий на все запросы: куки провайдера не должны переезжать между клиентами
+    return CookieJar(policy=DefaultCookiePolicy(allowed_domains=[]))
+
+
+class ProviderHTTP:
+    """Долгоживущие httpx-клиенты по провайдерам (keep-alive пул на воркер)."""
+
+    def __init__(
+        self,
+        timeouts: Optional[Dict[str, httpx.Timeout]] = None,
+        limits: Optional[httpx.Limits] = None,
+        http2: bool = False,
+        breaker_cfg: BreakerConfig = BreakerConfig(),
+    ):
+        self.timeouts = dict(timeouts or DEFAULT_TIMEOUTS)
+        self.limits = limits or httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0)
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self.breakers: Dict[str, CircuitBreaker] = {
+            provider: CircuitBreaker(provider, max_timeout=t.read or 15.0, cfg=breaker_cfg)
+            for provider, t in self.timeouts.items()
+        }
+        self.http2_requested = http2
+        self._http2 = http2 and _http2_available()
+
+    def _build(self, provider: str) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            timeout=self.timeouts.get(provider, httpx.Timeout(20.0)),
+            limits=self.limits,
+            http2=self._http2,
+            cookies=_no_cookies(),
+            follow_redirects=False,
+        )
+
+    async def start(self) -> None:
+        if self.http2_requested and not self._http2:
+            logger.warning("HTTP2_ENABLED=1, но пакет h2 не установлен (httpx[http2]) — работаем по HTTP/1.1")
+        for provider in self.timeouts:
+            if provider not in self._clients:
+                self._clients[provider] = self._build(provider)
+        logger.info(
+            "Provider HTTP clients started: %s (http2=%s, max_conn=%s, keepalive=%s)",
+            list(self._clients), self._http2, self.limits.max_connections, self.limits.max_keepalive_connections,
+        )
+
+    def client(self, provider: str) -> httpx.AsyncClient:
+        c: Optional[httpx.AsyncClient] = self._clients.get(provider)
+        if c is None or c.is_closed:
+            # вызов вне lifespan (скрипты/тесты) — создаём лениво
+            c = self._clients[provider] = self._build(provider)
+        return c
+
+    async def send(self, provider: str, request: httpx.Request, operation: str = "") -> httpx.Response:
+        """
+        Отправка через circuit breaker провайдера с адаптивным read-таймаутом.
+        Открытый breaker -> CircuitOpen сразу, без похода в сеть.
+        Отказ = сетевая ошибка/таймаут или 5xx.
+        operation — метка для метрик (по умолчанию путь запроса).
+        """
+        operation = operation or request.url.path
+        breaker = self.breakers[provider]
+        try:
+            breaker.before_call()
+        except CircuitOpen:
+            PROVIDER_REJECTED.labels(provider, operation).inc()
+            raise
+
+        base = self.timeouts.get(provider, httpx.Timeout(20.0))
+        t = breaker.timeout()
+        request.extensions["timeout"] = httpx.Timeout(t, connect=min(base.connect or t, t)).as_dict()
+
+        t0 = time.perf_counter()
+        try:
+            r = await self.client(provider).send(request)
+        except httpx.RequestError as e:
+            breaker.on_failure()
+            status = "timeout" if isinstance(e, httpx.TimeoutException) else "error"
+            PROVIDER_LATENCY.labels(provider, operation, status).observe(time.perf_counter() - t0)
+            raise
+        except BaseException:
+            breaker.on_abort()
+            raise
+        elapsed = time.perf_counter() - t0
+        PROVIDER_LATENCY.labels(provider, operation, status_class(r.status_code)).observe(elapsed)
+        if r.status_code >= 500:
+            breaker.on_failure()
+        else:
+            breaker.on_success(elapsed)
+        return r
+
+    async def close(self) -> None:
+        for provider, c in list(self._clients.items()):
+            try:
+                await c.aclose()
+            except Exception as e:
+                logger.warning("Provider HTTP client %s close failed: %s", provider, e)
+        self._clients.clear()
+
@@ -0,0 +1,122 @@
+# idempotency.py
+import uuid
+import asyncio
+import logging
+from typing import Optional, Dict, Any, Callable, Awaitable
+
+import redis.asyncio as redis
+
+from .metrics import IDEMP_LOOKUPS, REDIS_LATENCY
+from .serialization import dumps, loads
+
+logger = logging.getLogger("uvicorn.error")
+
+# снимаем лок только если он всё ещё наш
+_RELEASE_LUA = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class IdempotencyStore:
+    """
+    Идемпотентность в Redis: результат под `{prefix}{key}` с TTL,
+    плюс single-flight — повторы с тем же ключом ждут первый вызов провайдера.
+
+    Внутри процесса ожидающие делят один Future, между подами — лок SET NX PX.
+    """
+
+    def __init__(
+        self,
+        redis_cli: redis.Redis,
+        prefix: str,
+        ttl_sec: int = 86400,
+        lock_ttl_sec: int = 30,
+        wait_poll_sec: float = 0.05,
+    ):
+        self.redis = redis_cli
+        self.prefix = prefix
+        self.ttl_sec = ttl_sec
+        self.lock_ttl_sec = lock_ttl_sec
+        self.wait_poll_sec = wait_poll_sec
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._release = redis_cli.register_script(_RELEASE_LUA)
+
+    async def get(self, key: str, count: bool = True) -> Optional[Dict[str, Any]]:
+        """count=False — повторная проверка внутри run_once, в hit ratio не учитываем."""
+        with REDIS_LATENCY.labels("idem_get").time():
+            raw = await self.redis.get(self.prefix + key)
+        if count:
+            IDEMP_LOOKUPS.labels(self.prefix, "hit" if raw else "miss").inc()
+        return loads(raw) if raw else None
+
+    async def set(self, key: str, payload: Dict[str, Any]) -> None:
+        with REDIS_LATENCY.labels("idem_set").time():
+            await self.redis.set(self.prefix + key, dumps(payload), ex=self.ttl_sec)
+
+    async def set_many(self, items: Dict[str, Dict[str, Any]]) -> None:
+        """Пачка записей одним пайплайном (bulk-создание ссылок)."""
+        if not items:
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        for key, payload in items.items():
+            pipe.set(self.prefix + key, dumps(payload), ex=self.ttl_sec)
+        with REDIS_LATENCY.labels("idem_set_many").time():
+            await pipe.execute()
+
+    async def run_once(
+        self,
+        scope: str,
+        key: str,
+        fn: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        """
+        Выполняет fn не более одного раза одновременно для (scope, key).
+        fn сама проверяет кэш — второй исполнитель после снятия лока получит HIT.
+        Отмена первого вызова ожидающих не отменяет: один из них повторяет fn сам.
+        """
+        flight = f"{scope}:{key}"
+        while (fut := self._inflight.get(flight)) is not None:
+            logger.info("Idempotent coalesce scope=%s key=%s", scope, key)
+            IDEMP_LOOKUPS.labels(self.prefix, "coalesced").inc()
+            try:
+                return await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                # отменили первый вызов (клиент ушёл), а не нас — следующий круг, кто-то станет ведущим
+                if not fut.cancelled() or asyncio.current_task().cancelling():
+                    raise
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[flight] = fut
+        try:
+            result = await self._run_locked(flight, fn)
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # помечаем как прочитанное, если ожидающих не было
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(flight, None)
+
+    async def _run_locked(self, flight: str, fn: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        lock_key = f"{self.prefix}lock:{flight}"
+        token = uuid.uuid4().hex
+        delay = self.wait_poll_sec
+        while not await self.redis.set(lock_key, token, nx=True, ex=self.lock_ttl_sec):
+            # ключ обрабатывает другой под — ждём, пока отпустит (или истечёт TTL)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+        try:
+            return await fn()
+        finally:
+            try:
+                await self._release(keys=[lock_key], args=[token])
+            except Exception as e:
+                logger.warning("Idempotency lock release failed %s: %s", lock_key, e)
@@ -0,0 +1,240 @@
+# ledger.py
+import asyncio
+import logging
+from collections import deque
+from decimal import Decimal, InvalidOperation
+from typing import Optional, Deque, Dict, Any, List, Tuple
+
+from .db import Database
+from .serialization import dumps
+
+logger = logging.getLogger("uvicorn.error")
+
+LEDGER_RECEIPTS_LIMIT = 50
+
+# ===== подготовленные запросы (PREPARE на каждом соединении пула) =====
+_PREPARED = [
+    """
+    PREPARE ledger_order_created (text, text, text, numeric, text, text) AS
+    INSERT INTO payment_orders (payment_id, provider, provider_order_id, amount, currency, pay_url)
+    VALUES ($1, $2, $3, $4, $5, $6)
+    ON CONFLICT (payment_id) DO UPDATE SET
+        provider_order_id = COALESCE(EXCLUDED.provider_order_id, payment_orders.provider_order_id),
+        amount = COALESCE(EXCLUDED.amount, payment_orders.amount),
+        currency = COALESCE(EXCLUDED.currency, payment_orders.currency),
+        pay_url = COALESCE(EXCLUDED.pay_url, payment_orders.pay_url),
+        updated_at = now()
+    """,
+    """
+    PREPARE ledger_link_issued (text, text, text, timestamptz) AS
+    INSERT INTO payment_orders (payment_id, provider, link_token, link_expires_at)
+    VALUES ($1, $2, $3, $4)
+    ON CONFLICT (payment_id) DO UPDATE SET
+        link_token = EXCLUDED.link_token,
+        link_expires_at = EXCLUDED.link_expires_at,
+        updated_at = now()
+    """,
+    """
+    PREPARE ledger_status (text, text, text, numeric, text) AS
+    INSERT INTO payment_orders (payment_id, provider, status, amount, currency, paid_at)
+    VALUES ($1, $2, $3, $4, $5, CASE WHEN $3 = 'success' THEN now() END)
+    ON CONFLICT (payment_id) DO UPDATE SET
+        -- успешную оплату поздний колбэк другим статусом не перетирает
+        status = CASE WHEN payment_orders.status = 'success' THEN payment_orders.status ELSE EXCLUDED.status END,
+        paid_at = COALESCE(payment_orders.paid_at, EXCLUDED.paid_at),
+        amount = COALESCE(payment_orders.amount, EXCLUDED.amount),
+        updated_at = now()
+    """,
+    """
+    PREPARE ledger_receipt (text, text, text, text, text, numeric, text, text, jsonb) AS
+    INSERT INTO payment_webhook_receipts
+        (payment_id, provider, schema, event_key, status, amount, currency, result, raw)
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+    """,
+    """
+    PREPARE ledger_get_order (text) AS
+    SELECT payment_id, provider, provider_order_id, amount::text, currency, pay_url,
+           link_token, link_expires_at, status, created_at, updated_at, paid_at
+    FROM payment_orders WHERE payment_id = $1
+    """,
+    f"""
+    PREPARE ledger_get_receipts (text) AS
+    SELECT id, provider, schema, event_key, status, amount::text, currency, result, raw, received_at
+    FROM payment_webhook_receipts WHERE payment_id = $1
+    ORDER BY id DESC LIMIT {LEDGER_RECEIPTS_LIMIT}
+    """,
+]
+
+_ORDER_COLS = ("payment_id", "provider", "provider_order_id", "amount", "currency", "pay_url",
+               "link_token", "link_expires_at", "status", "created_at", "updated_at", "paid_at")
+_RECEIPT_COLS = ("id", "provider", "schema", "event_key", "status", "amount", "currency", "result",
+                 "raw", "received_at")
+
+Row = Tuple[str, tuple]  # (имя подготовленного запроса, параметры)
+
+
+def _amount(value: Any) -> Optional[Decimal]:
+    if value is None or value == "":
+        return None
+    try:
+        return Decimal(str(value)).quantize(Decimal("0.01"))
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def _row_dict(cols: Tuple[str, ...], row: tuple) -> Dict[str, Any]:
+    return {c: (v.isoformat() if hasattr(v, "isoformat") else v) for c, v in zip(cols, row)}
+
+
+class OrderLedger:
+    """
+    Журнал заказов в db-pay: создание у провайдера, выданная ссылка, колбэки.
+
+    Запись не на пути запроса: строки копятся в буфере, фоновая задача
+    сбрасывает их пачкой — один round-trip из EXECUTE подготовленных запросов.
+    Потеря хвоста буфера при падении пода допустима: события об оплате
+    идут через outbox, журнал — для поддержки и сверки.
+    """
+
+    def __init__(self, database: Database, batch: int = 200, flush_ms: int = 200, max_pending: int = 20000):
+        self.db = database
+        self.batch = batch
+        self.flush_ms = flush_ms
+        self.max_pending = max_pending
+        # полный буфер (db-pay лежит) сам выталкивает самые старые строки
+        self._pending: Deque[Row] = deque(maxlen=max_pending)
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.stats: Dict[str, int] = {"written": 0, "dropped": 0, "failed": 0, "flushes": 0}
+        for stmt in _PREPARED:
+            database.prepare(stmt)
+
+    @property
+    def enabled(self) -> bool:
+        return self.db.enabled
+
+    # ===== запись =====
+    def _add(self, name: str, params: tuple) -> None:
+        if not self.enabled:
+            return
+        if len(self._pending) >= self.max_pending:
+            self.stats["dropped"] += 1
+        self._pending.append((name, params))
+        if len(self._pending) >= self.batch:
+            self._wake.set()
+
+    def order_created(
+        self,
+        payment_id: str,
+        provider: str,
+        amount: Any,
+        pay_url: Optional[str],
+        provider_order_id: Optional[str] = None,
+        currency: Optional[str] = "RUB",
+    ) -> None:
+        self._add("ledger_order_created",
+                  (payment_id, provider, provider_order_id or None, _amount(amount), currency, pay_url))
+
+    def link_issued(self, payment_id: Optional[str], provider: str, token: str, expires_at: str) -> None:
+        if payment_id:
+            self._add("ledger_link_issued", (payment_id, provider, token, expires_at))
+
+    def webhook_received(self, event: Dict[str, Any], result: str) -> None:
+        """result — accepted или failed; дубликаты только в метрике WEBHOOKS."""
+        # ключ журнала — номер, который мы отправляли провайдеру
+        payment_id = str(event.get("payment_id") or event.get("order_id") or "")
+        if not payment_id:
+            return
+        amount = _amount(event.get("amount"))
+        self._add("ledger_receipt", (
+            payment_id, event.get("provider"), event.get("schema"), event.get("event_key"),
+            event.get("status"), amount, event.get("currency") or None, result,
+            dumps(event.get("raw") or {}).decode("utf-8"),
+        ))
+        if result == "accepted":
+            self._add("ledger_status", (payment_id, event.get("provider"), event.get("status") or "unknown",
+                                        amount, event.get("currency") or None))
+
+    # ===== фоновая запись =====
+    async def flush(self) -> int:
+        """Одна пачка из буфера; возвращает, сколько строк вынуто (записанных и потерянных)."""
+        if not self._pending or not self.enabled:
+            return 0
+        rows: List[Row] = [self._pending.popleft() for _ in range(min(self.batch, len(self._pending)))]
+        written = 0
+        try:
+            async with self.db.pool.acquire() as conn:
+                async with conn.cursor() as cur:
+                    stmts = [
+                        cur.mogrify(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params).decode()
+                        for name, params in rows
+                    ]
+                    try:
+                        # несколько операторов в одном запросе — одна неявная транзакция
+                        await cur.execute(";".join(stmts))
+                        written = len(rows)
+                    except Exception as e:
+                        logger.error("Ledger batch of %s failed, writing one by one: %s", len(rows), e)
+                        for stmt in stmts:
+                            try:
+                                await cur.execute(stmt)
+                                written += 1
+                            except Exception as e1:
+                                logger.error("Ledger row dropped: %s (%s)", e1, stmt[:200])
+        finally:
+            # строки уже вынуты из буфера: всё незаписанное (в т.ч. при ошибке пула) — потеряно
+            self.stats["written"] += written
+            self.stats["failed"] += len(rows) - written
+            self.stats["flushes"] += 1
+        return len(rows)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_ms / 1000.0)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                while await self.flush() >= self.batch:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # потерянные строки flush() уже посчитал в failed
+                logger.error("Ledger flush error: %s", e)
+
+    def start(self) -> None:
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        try:
+            while await self.flush():
+                pass
+        except Exception as e:
+            logger.error("Ledger final flush failed, %s rows lost: %s", len(self._pending), e)
+
+    # ===== чтение =====
+    async def lookup(self, payment_id: str) -> Optional[Dict[str, Any]]:
+        """Заказ + последние колбэки; None — ничего не знаем."""
+        async with self.db.pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("EXECUTE ledger_get_order (%s)", (payment_id,))
+                order = await cur.fetchone()
+                await cur.execute("EXECUTE ledger_get_receipts (%s)", (payment_id,))
+                receipts = await cur.fetchall()
+        if order is None and not receipts:
+            return None
+        return {
+            "order": _row_dict(_ORDER_COLS, order) if order else None,
+            "webhooks": [_row_dict(_RECEIPT_COLS, r) for r in receipts],
+        }
+
@@ -0,0 +1,145 @@
+# metrics.py
+import os
+import time
+import logging
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+logger = logging.getLogger("uvicorn.error")
+
+# при нескольких воркерах uvicorn каждый пишет свои значения в этот каталог,
+# /metrics собирает сумму по всем (каталог чистится при старте пода)
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+
+# ========= HTTP =========
+HTTP_LATENCY = Histogram(
+    "payapi_http_request_duration_seconds",
+    "Время обработки HTTP-запроса",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20),
+)
+
+# ========= Провайдеры =========
+PROVIDER_LATENCY = Histogram(
+    "payapi_provider_request_duration_seconds",
+    "Время вызова провайдера",
+    ["provider", "operation", "status"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 12, 15, 20),
+)
+PROVIDER_REJECTED = Counter(
+    "payapi_provider_rejected_total",
+    "Вызовы, отбитые открытым circuit breaker",
+    ["provider", "operation"],
+)
+BREAKER_STATE = Gauge(
+    "payapi_circuit_state",
+    "Состояние breaker: 0 closed, 1 half_open, 2 open",
+    ["provider"],
+    multiprocess_mode="livemax",
+)
+
+# ========= Redis / RabbitMQ =========
+REDIS_LATENCY = Histogram(
+    "payapi_redis_operation_duration_seconds",
+    "Время операции Redis",
+    ["op"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+RABBIT_LATENCY = Histogram(
+    "payapi_rabbit_publish_duration_seconds",
+    "Время публикации в RabbitMQ (до publisher confirm)",
+    ["op"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+RABBIT_FAILED = Counter(
+    "payapi_rabbit_publish_failed_total",
+    "Неудачные публикации в RabbitMQ",
+    ["op"],
+)
+
+# ========= Кэши / идемпотентность / вебхуки =========
+IDEMP_LOOKUPS = Counter(
+    "payapi_idempotency_lookups_total",
+    "Проверки ключа идемпотентности: hit / miss / coalesced",
+    ["store", "result"],
+)
+PAYLINK_L1_LOOKUPS = Counter(
+    "payapi_paylink_l1_lookups_total",
+    "Обращения к L1-кэшу ссылок: hit / negative_hit / miss",
+    ["result"],
+)
+WEBHOOKS = Counter(
+    "payapi_webhooks_total",
+    "Вебхуки провайдеров по схеме и исходу",
+    ["schema", "result"],
+)
+RATE_LIMIT = Counter(
+    "payapi_rate_limit_total",
+    "Проверки лимита: allowed / denied / local_denied / error",
+    ["scope", "result"],
+)
+
+
+def mark_worker_dead() -> None:
+    """Воркер завершается — убираем его live-gauge из мультипроцессной сводки."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def status_class(code: int) -> str:
+    return f"{code // 100}xx"
+
+
+def render():
+    """(body, content_type) для /metrics."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    ASGI-мидлварь: латентность по шаблону роута (/pay/{token}, а не по токену),
+    чтобы не раздувать кардинальность.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def _send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            route = scope.get("route")
+            HTTP_LATENCY.labels(
+                scope.get("method", ""),
+                getattr(route, "path", "unmatched"),
+                str(status),
+            ).observe(time.perf_counter() - t0)
@@ -0,0 +1,154 @@
+# outbox.py
+import asyncio
+import logging
+from typing import Optional, Dict, Any
+
+from .db import Database
+from .publisher import EventPublisher, encode_event
+
+logger = logging.getLogger("uvicorn.error")
+
+OUTBOX_CLEANUP_EVERY_SEC = 600
+
+
+class Outbox:
+    """
+    Вебхук только пишет событие в payment_outbox (быстрая локальная вставка),
+    фоновый дренер публикует пачками в RabbitMQ с ретраями и backoff.
+    FOR UPDATE SKIP LOCKED — реплики не публикуют одну строку дважды.
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        pub: EventPublisher,
+        batch: int = 100,
+        poll_sec: float = 1.0,
+        max_backoff_sec: int = 300,
+        retention_hours: int = 72,
+    ):
+        self.db = database
+        self.publisher = pub
+        self.batch = batch
+        self.poll_sec = poll_sec
+        self.max_backoff_sec = max_backoff_sec
+        self.retention_hours = retention_hours
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._last_cleanup = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.db.enabled
+
+    async def enqueue(self, event: Dict[str, Any], dedup_key: Optional[str] = None) -> bool:
+        """
+        Сохраняет событие в outbox. False — строка с таким dedup_key уже есть (дубль).
+        Без db-pay (или если вставка упала) — публикуем сразу; ошибка публикации
+        пробрасывается вызывающему.
+        """
+        body = encode_event(event)
+        if self.enabled:
+            try:
+                async with self.db.pool.acquire() as conn:
+                    async with conn.cursor() as cur:
+                        await cur.execute(
+                            "INSERT INTO payment_outbox (event_key, dedup_key, body) VALUES (%s, %s, %s) "
+                            "ON CONFLICT (dedup_key) DO NOTHING RETURNING id",
+                            (event.get("event_key"), dedup_key, body.decode("utf-8")),
+                        )
+                        inserted = await cur.fetchone() is not None
+                if inserted:
+                    self._wake.set()
+                return inserted
+            except Exception as e:
+                logger.error("Outbox insert failed, publishing inline: %s", e)
+        await self.publisher.publish_raw(body)
+        return True
+
+    async def drain_once(self) -> int:
+        async with self.db.pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                async with cur.begin():
+                    await cur.execute(
+                        """
+                        SELECT id, body FROM payment_outbox
+                        WHERE published_at IS NULL AND next_attempt_at <= now()
+                        ORDER BY id
+                        LIMIT %s
+                        FOR UPDATE SKIP LOCKED
+                        """,
+                        (self.batch,),
+                    )
+                    rows = await cur.fetchall()
+                    if not rows:
+                        return 0
+
+                    errors = await self.publisher.publish_batch([body.encode("utf-8") for _, body in rows])
+                    ok_ids = [row_id for (row_id, _), err in zip(rows, errors) if err is None]
+                    failed = [(row_id, err) for (row_id, _), err in zip(rows, errors) if err is not None]
+
+                    if ok_ids:
+                        await cur.execute(
+                            "UPDATE payment_outbox SET published_at = now() WHERE id = ANY(%s)",
+                            (ok_ids,),
+                        )
+                    for row_id, err in failed:
+                        await cur.execute(
+                            """
+                            UPDATE payment_outbox
+                            SET attempts = attempts + 1,
+                                last_error = %s,
+                                next_attempt_at = now() + make_interval(secs => LEAST(%s, power(2, attempts)))
+                            WHERE id = %s
+                            """,
+                            (str(err)[:500], self.max_backoff_sec, row_id),
+                        )
+        if failed:
+            logger.error("Outbox: %s of %s events failed to publish, will retry", len(failed), len(rows))
+        return len(rows)
+
+    async def _cleanup(self) -> None:
+        loop = asyncio.get_running_loop()
+        if loop.time() - self._last_cleanup < OUTBOX_CLEANUP_EVERY_SEC:
+            return
+        self._last_cleanup = loop.time()
+        async with self.db.pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    "DELETE FROM payment_outbox "
+                    "WHERE published_at IS NOT NULL AND published_at < now() - make_interval(hours => %s)",
+                    (self.retention_hours,),
+                )
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                drained = await self.drain_once()
+                await self._cleanup()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Outbox drain error: %s", e)
+                drained = 0
+            if drained >= self.batch:
+                continue  # хвост ещё есть — сразу следующую пачку
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_sec)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def start(self) -> None:
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
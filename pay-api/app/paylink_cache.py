@@ -0,0 +1,154 @@
+# paylink_cache.py
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Dict, Any, Tuple
+
+import redis.asyncio as redis
+
+from .metrics import PAYLINK_L1_LOOKUPS, REDIS_LATENCY
+
+logger = logging.getLogger("uvicorn.error")
+
+PAYLINK_INVALIDATE_CHANNEL = "paylink:invalidate"
+
+
+def _expires_ts(rec: Dict[str, Any]) -> Optional[float]:
+    raw = rec.get("expires_at")
+    if not raw:
+        return None
+    try:
+        return datetime.fromisoformat(str(raw).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+class PayLinkCache:
+    """
+    L1-кэш прокладочных ссылок в памяти воркера: LRU с ограничением размера,
+    TTL не дольше expires_at самой ссылки, короткий негативный кэш для неизвестных токенов.
+    Инвалидация между подами — через Redis pub/sub.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        ttl_sec: float = 300.0,
+        negative_ttl_sec: float = 5.0,
+    ):
+        self.max_size = max_size
+        self.ttl_sec = ttl_sec
+        self.negative_ttl_sec = negative_ttl_sec
+        # key -> (deadline_ts, rec | None)
+        self._data: "OrderedDict[str, Tuple[float, Optional[Dict[str, Any]]]]" = OrderedDict()
+        self._listener: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """(найдено_в_L1, запись). Запись None при found=True — негативный кэш."""
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            PAYLINK_L1_LOOKUPS.labels("miss").inc()
+            return False, None
+        deadline, rec = item
+        if deadline <= time.time():
+            self._data.pop(key, None)
+            self.misses += 1
+            PAYLINK_L1_LOOKUPS.labels("miss").inc()
+            return False, None
+        self._data.move_to_end(key)
+        if rec is None:
+            self.negative_hits += 1
+            PAYLINK_L1_LOOKUPS.labels("negative_hit").inc()
+        else:
+            self.hits += 1
+            PAYLINK_L1_LOOKUPS.labels("hit").inc()
+        return True, rec
+
+    def put(self, key: str, rec: Optional[Dict[str, Any]]) -> None:
+        now = time.time()
+        if rec is None:
+            deadline = now + self.negative_ttl_sec
+        else:
+            deadline = now + self.ttl_sec
+            exp = _expires_ts(rec)
+            if exp is not None:
+                deadline = min(deadline, exp)
+            if deadline <= now:
+                return
+        self._data[key] = (deadline, rec)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        if self._data.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_ratio": round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+    # --- pub/sub ---
+    async def publish_invalidation(self, redis_cli: redis.Redis, key: str) -> None:
+        self.invalidate(key)
+        try:
+            with REDIS_LATENCY.labels("paylink_invalidate").time():
+                await redis_cli.publish(PAYLINK_INVALIDATE_CHANNEL, key)
+        except Exception as e:
+            logger.warning("Paylink invalidation publish failed %s: %s", key, e)
+
+    async def _listen(self, redis_cli: redis.Redis) -> None:
+        while True:
+            pubsub = redis_cli.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(PAYLINK_INVALIDATE_CHANNEL)
+                # пока не были подписаны, могли пропустить инвалидации
+                self.clear()
+                async for msg in pubsub.listen():
+                    if msg.get("type") == "message":
+                        self.invalidate(str(msg.get("data")))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Paylink invalidation listener error: %s", e)
+                await asyncio.sleep(1.0)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    def start(self, redis_cli: redis.Redis) -> None:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen(redis_cli))
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener = None
+
@@ -0,0 +1,68 @@
+# paylink_tokens.py
+import time
+import hmac
+import base64
+import hashlib
+from typing import Optional
+
+# ключ задан (PAYLINK_SIGNING_KEY) -> умеем проверять подписанные токены;
+# PAYLINK_STATELESS=1 -> ещё и выдаём их (Resources.paylink_stateless)
+
+TOKEN_PREFIX = "s1."
+_MAC_BYTES = 16
+
+
+def _b64e(b: bytes) -> str:
+    return base64.urlsafe_b64encode(b).rstrip(b"=").decode("ascii")
+
+
+def _b64d(s: str) -> bytes:
+    return base64.urlsafe_b64decode(s + "=" * (-len(s) % 4))
+
+
+def is_signed_token(token: str) -> bool:
+    return token.startswith(TOKEN_PREFIX)
+
+
+class PayLinkSigner:
+    """
+    Самодостаточный токен прокладки: s1.<b64(expires|provider_url)>.<b64(hmac)>.
+    Редирект проверяет подпись и срок без похода в Redis.
+    scope ("fk" / "plnk") входит в подпись, чтобы токен v1 не открывался через /v2/pay.
+    """
+
+    def __init__(self, key: str):
+        # ключ разворачивается в HMAC-состояние один раз, дальше только copy()
+        self._mac = hmac.new(key.encode("utf-8"), digestmod=hashlib.sha256)
+
+    def _sign(self, scope: str, body: bytes) -> bytes:
+        mac = self._mac.copy()
+        mac.update(scope.encode("ascii") + b"\x00" + body)
+        return mac.digest()[:_MAC_BYTES]
+
+    def issue(self, scope: str, url: str, ttl_seconds: int) -> str:
+        expires = int(time.time()) + int(ttl_seconds)
+        body = f"{expires}|{url}".encode("utf-8")
+        return f"{TOKEN_PREFIX}{_b64e(body)}.{_b64e(self._sign(scope, body))}"
+
+    def verify(self, scope: str, token: str) -> Optional[str]:
+        """URL провайдера или None (битый/чужой/просроченный токен)."""
+        if not is_signed_token(token):
+            return None
+        try:
+            body_b64, sig_b64 = token[len(TOKEN_PREFIX):].split(".", 1)
+            body = _b64d(body_b64)
+            sig = _b64d(sig_b64)
+        except (ValueError, TypeError):
+            return None
+        if not hmac.compare_digest(sig, self._sign(scope, body)):
+            return None
+        try:
+            exp_raw, url = body.decode("utf-8").split("|", 1)
+            expires = int(exp_raw)
+        except (UnicodeDecodeError, ValueError):
+            return None
+        if expires <= time.time():
+            return None
+        return url
+
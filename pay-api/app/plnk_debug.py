@@ -0,0 +1,217 @@
+# plnk_debug.py
+import os
+import time
+import socket
+import base64
+import random
+import asyncio
+import hashlib
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set
+
+import redis.asyncio as redis
+
+from .serialization import dumps, loads
+
+logger = logging.getLogger("uvicorn.error")
+
+# конфиг и буфер общие для всех воркеров и подов; смена конфига рассылается через pub/sub
+PLNK_DEBUG_CONFIG_KEY = "plnk:debug:config"
+PLNK_DEBUG_RING_KEY = "plnk:debug:ring"
+PLNK_DEBUG_CHANNEL = "plnk:debug:config"
+PLNK_DEBUG_RING_TTL_SEC = 24 * 3600
+
+
+class DebugCapture:
+    """
+    Отладочные дампы обменов с paymentlnk по требованию.
+
+    Выключено по умолчанию: should_capture() — пара сравнений, ни хэшей, ни логов.
+    Включается на лету (по аккаунту или долей запросов, опционально с автоотключением).
+    Конфиг лежит в Redis и рассылается всем воркерам через pub/sub; последние N обменов
+    со всех воркеров — в общем списке Redis (без Redis — в кольцевом буфере своего воркера).
+    """
+
+    def __init__(
+        self,
+        maxlen: int = 200,
+        sample_rate: float = 0.0,
+        accounts: Iterable[str] = (),
+        text_max: int = 65536,
+    ):
+        self._ring: Deque[Dict[str, Any]] = deque(maxlen=maxlen)
+        self.maxlen = maxlen
+        self.text_max = text_max
+        # конфиг из Settings — к нему возвращаемся, когда общий ключ в Redis истёк
+        self._defaults = (max(0.0, min(1.0, sample_rate)), [a for a in accounts if a])
+        self.sample_rate = self._defaults[0]
+        self.accounts: Set[str] = set(self._defaults[1])
+        self.until: Optional[float] = None
+        self.redis: Optional[redis.Redis] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._worker = f"{socket.gethostname()}:{os.getpid()}"
+
+    @property
+    def active(self) -> bool:
+        if self.until is not None and time.time() >= self.until:
+            self.sample_rate, self.accounts, self.until = 0.0, set(), None
+        return bool(self.sample_rate or self.accounts)
+
+    def should_capture(self, account: Optional[str]) -> bool:
+        if not self.active:
+            return False
+        if account and account in self.accounts:
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _apply(self, sample_rate: float, accounts: List[str], until: Optional[float]) -> None:
+        self.sample_rate = max(0.0, min(1.0, float(sample_rate)))
+        self.accounts = {a for a in accounts if a}
+        self.until = until
+
+    async def configure(self, sample_rate: float, accounts: List[str], ttl_sec: Optional[int]) -> Dict[str, Any]:
+        """Новый конфиг для всех воркеров: ключ в Redis (с TTL автоотключения) + рассылка."""
+        until = time.time() + ttl_sec if ttl_sec else None
+        self._apply(sample_rate, accounts, until)
+        if self.redis is not None:
+            raw = dumps({"sample_rate": self.sample_rate, "accounts": sorted(self.accounts), "until": until})
+            try:
+                await self.redis.set(PLNK_DEBUG_CONFIG_KEY, raw, ex=int(ttl_sec) if ttl_sec else None)
+                await self.redis.publish(PLNK_DEBUG_CHANNEL, "1")
+            except Exception as e:
+                logger.warning("PLNK debug config not shared, only worker %s is capturing: %s", self._worker, e)
+        return await self.config()
+
+    async def _load(self) -> None:
+        raw = await self.redis.get(PLNK_DEBUG_CONFIG_KEY)
+        if raw:
+            cfg = loads(raw)
+            self._apply(cfg.get("sample_rate") or 0.0, cfg.get("accounts") or [], cfg.get("until"))
+        else:
+            # ключа нет (истёк TTL или не включали) — конфиг из Settings
+            self._apply(*self._defaults, None)
+
+    async def config(self) -> Dict[str, Any]:
+        active = self.active
+        buffered = len(self._ring)
+        if self.redis is not None:
+            try:
+                buffered = await self.redis.llen(PLNK_DEBUG_RING_KEY)
+            except Exception:
+                pass
+        return {
+            "active": active,
+            "sample_rate": self.sample_rate,
+            "accounts": sorted(self.accounts),
+            "until": self.until,
+            "buffered": buffered,
+            "capacity": self.maxlen,
+            "worker": self._worker,
+        }
+
+    async def record_exchange(
+        self,
+        *,
+        label: str,
+        request,
+        response=None,
+        error: Optional[str] = None,
+        elapsed_ms: Optional[float] = None,
+    ) -> None:
+        """Всё тяжёлое (sha256/base64/заголовки) считается только здесь."""
+        body = bytes(request.content or b"")
+        entry: Dict[str, Any] = {
+            "ts": time.time(),
+            "worker": self._worker,
+            "label": label,
+            "request": {
+                "method": request.method,
+                "url": str(request.url),
+                "headers": dict(request.headers),
+                "body_text": body.decode("utf-8", "replace")[:self.text_max],
+                "body_len": len(body),
+                "body_sha256": hashlib.sha256(body).hexdigest(),
+                "body_b64": base64.b64encode(body).decode("ascii"),
+            },
+            "elapsed_ms": round(elapsed_ms, 2) if elapsed_ms is not None else None,
+        }
+        if response is not None:
+            entry["response"] = {
+                "status": response.status_code,
+                "headers": dict(response.headers),
+                "text": response.text[:self.text_max],
+            }
+        if error:
+            entry["error"] = error
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                pipe.lpush(PLNK_DEBUG_RING_KEY, dumps(entry))
+                pipe.ltrim(PLNK_DEBUG_RING_KEY, 0, self.maxlen - 1)
+                pipe.expire(PLNK_DEBUG_RING_KEY, PLNK_DEBUG_RING_TTL_SEC)
+                await pipe.execute()
+                return
+            except Exception as e:
+                logger.warning("PLNK debug entry kept locally in worker %s: %s", self._worker, e)
+        self._ring.append(entry)
+
+    async def entries(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Свежие сверху."""
+        if limit <= 0:
+            return []
+        local = list(self._ring)[-limit:][::-1]
+        if self.redis is None:
+            return local
+        try:
+            shared = [loads(raw) for raw in await self.redis.lrange(PLNK_DEBUG_RING_KEY, 0, limit - 1)]
+        except Exception as e:
+            logger.warning("PLNK debug ring unavailable: %s", e)
+            return local
+        return sorted(shared + local, key=lambda e: e["ts"], reverse=True)[:limit]
+
+    async def clear(self) -> None:
+        self._ring.clear()
+        if self.redis is not None:
+            try:
+                await self.redis.delete(PLNK_DEBUG_RING_KEY)
+            except Exception as e:
+                logger.warning("PLNK debug ring clear failed: %s", e)
+
+    # --- pub/sub ---
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(PLNK_DEBUG_CHANNEL)
+                # пока не были подписаны, конфиг могли поменять
+                await self._load()
+                async for msg in pubsub.listen():
+                    if msg.get("type") == "message":
+                        await self._load()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("PLNK debug config listener error: %s", e)
+                await asyncio.sleep(1.0)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    def start(self, redis_cli: redis.Redis) -> None:
+        self.redis = redis_cli
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener = None
+        self.redis = None
+
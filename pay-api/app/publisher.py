@@ -0,0 +1,136 @@
+# publisher.py
+import time
+import asyncio
+import logging
+from typing import Optional, Dict, Any, List
+
+import aio_pika
+from aio_pika.pool import Pool
+
+from .metrics import RABBIT_LATENCY, RABBIT_FAILED
+from .serialization import EVENT_CONTENT_TYPE, EVENT_HEADERS, dumps
+
+logger = logging.getLogger("uvicorn.error")
+
+EVENTS_QUEUE = "payments.events"
+
+
+def _message(body: bytes) -> aio_pika.Message:
+    # по content_type + x-event-version потребитель выбирает декодер
+    return aio_pika.Message(
+        body=body,
+        content_type=EVENT_CONTENT_TYPE,
+        content_encoding="utf-8",
+        headers=dict(EVENT_HEADERS),
+        delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+    )
+
+
+class EventPublisher:
+    """
+    Одно robust-соединение на воркер + небольшой пул каналов с publisher confirms.
+    Очередь объявляется один раз при старте, а не на каждый вебхук.
+    """
+
+    def __init__(self, url: str, pool_size: int = 4, publish_timeout: float = 5.0):
+        self.url = url
+        self.pool_size = pool_size
+        self.publish_timeout = publish_timeout
+        self._conn: Optional[aio_pika.abc.AbstractRobustConnection] = None
+        self._channels: Optional[Pool] = None
+        self._start_lock = asyncio.Lock()
+        self.stats: Dict[str, float] = {
+            "published": 0,
+            "failed": 0,
+            "latency_ms_sum": 0.0,
+            "latency_ms_max": 0.0,
+        }
+
+    async def _new_channel(self) -> aio_pika.abc.AbstractChannel:
+        return await self._conn.channel(publisher_confirms=True)
+
+    async def start(self) -> None:
+        async with self._start_lock:
+            if self._conn is not None and not self._conn.is_closed:
+                return
+            self._conn = await aio_pika.connect_robust(self.url)
+            self._channels = Pool(self._new_channel, max_size=self.pool_size)
+            async with self._channels.acquire() as ch:
+                await ch.declare_queue(EVENTS_QUEUE, durable=True)
+            logger.info("RabbitMQ publisher started (channels<=%s)", self.pool_size)
+
+    async def close(self) -> None:
+        if self._channels is not None:
+            await self._channels.close()
+            self._channels = None
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    def _record(self, elapsed_ms: float, op: str = "publish") -> None:
+        RABBIT_LATENCY.labels(op).observe(elapsed_ms / 1000.0)
+        self.stats["published"] += 1
+        self.stats["latency_ms_sum"] += elapsed_ms
+        if elapsed_ms > self.stats["latency_ms_max"]:
+            self.stats["latency_ms_max"] = elapsed_ms
+
+    async def publish(self, event: Dict[str, Any]) -> None:
+        """Публикует событие и ждёт confirm брокера. Ошибки пробрасываются."""
+        await self.publish_raw(encode_event(event))
+
+    async def publish_raw(self, body: bytes) -> None:
+        if self._channels is None:
+            # вне lifespan (скрипты) — поднимаемся лениво
+            await self.start()
+
+        t0 = time.perf_counter()
+        try:
+            async with self._channels.acquire() as ch:
+                await ch.default_exchange.publish(
+                    _message(body),
+                    routing_key=EVENTS_QUEUE,
+                    timeout=self.publish_timeout,
+                )
+        except Exception:
+            self.stats["failed"] += 1
+            RABBIT_FAILED.labels("publish").inc()
+            raise
+        self._record((time.perf_counter() - t0) * 1000.0)
+
+    async def publish_batch(self, bodies: List[bytes]) -> List[Optional[BaseException]]:
+        """
+        Публикует пачку на одном канале, confirms ждём параллельно.
+        Возвращает ошибку (или None) для каждого сообщения в том же порядке.
+        """
+        if self._channels is None:
+            await self.start()
+
+        t0 = time.perf_counter()
+        async with self._channels.acquire() as ch:
+            results = await asyncio.gather(
+                *(
+                    ch.default_exchange.publish(
+                        _message(b),
+                        routing_key=EVENTS_QUEUE,
+                        timeout=self.publish_timeout,
+                    )
+                    for b in bodies
+                ),
+                return_exceptions=True,
+            )
+        elapsed_ms = (time.perf_counter() - t0) * 1000.0
+        errors: List[Optional[BaseException]] = []
+        for res in results:
+            if isinstance(res, BaseException):
+                self.stats["failed"] += 1
+                RABBIT_FAILED.labels("publish_batch").inc()
+                errors.append(res)
+            else:
+                self._record(elapsed_ms, "publish_batch")
+                errors.append(None)
+        return errors
+
+
+def encode_event(event: Dict[str, Any]) -> bytes:
+    return dumps(event)
+
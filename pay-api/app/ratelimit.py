@@ -0,0 +1,133 @@
+# ratelimit.py
+import time
+import hashlib
+import logging
+from typing import Dict, Optional, Sequence, Tuple
+
+import redis.asyncio as redis
+from fastapi import HTTPException
+
+from .metrics import RATE_LIMIT, REDIS_LATENCY
+
+logger = logging.getLogger("uvicorn.error")
+
+# Token bucket, несколько ярусов за один вызов (тот же скрипт в main-app/core/ratelimit.py).
+# KEYS — бакеты; ARGV[1] — стоимость, дальше пары (ёмкость, пополнение в секунду).
+# Списываем только если хватает во всех ярусах, иначе возвращаем, сколько ждать.
+TOKEN_BUCKET_LUA = """
+local t = redis.call("TIME")
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local cost = tonumber(ARGV[1])
+local left = {}
+local wait = 0
+for i = 1, #KEYS do
+    local cap = tonumber(ARGV[2 * i])
+    local rate = tonumber(ARGV[2 * i + 1])
+    local b = redis.call("HMGET", KEYS[i], "tokens", "ts")
+    local tokens = tonumber(b[1]) or cap
+    local ts = tonumber(b[2]) or now
+    tokens = math.min(cap, tokens + math.max(0, now - ts) * rate)
+    local need = math.min(cost, cap)
+    if tokens < need then
+        wait = math.max(wait, (need - tokens) / rate)
+    end
+    left[i] = tokens - need
+end
+if wait > 0 then
+    return {0, tostring(wait)}
+end
+for i = 1, #KEYS do
+    local cap = tonumber(ARGV[2 * i])
+    local rate = tonumber(ARGV[2 * i + 1])
+    redis.call("HSET", KEYS[i], "tokens", left[i], "ts", now)
+    redis.call("PEXPIRE", KEYS[i], math.ceil(cap / rate * 1000) + 1000)
+end
+return {1, "0"}
+"""
+
+# (ёмкость, пополнение токенов в секунду)
+Tier = Tuple[float, float]
+
+
+class RateLimiter:
+    """
+    Лимит на клиента поверх Redis (атомарно, общий для всех воркеров и подов).
+
+    Локально помним только отказы: пока клиент заведомо ждёт retry_after,
+    повторные попытки отбиваем без Redis. «Заведомо под лимитом» локально
+    не узнать — остальные воркеры тратят тот же бакет.
+    """
+
+    def __init__(self, redis_cli: redis.Redis, scope: str, tiers: Sequence[Tier], local_max: int = 10000):
+        self.redis = redis_cli
+        self.scope = scope
+        self.tiers = [(float(cap), float(rate)) for cap, rate in tiers if cap > 0 and rate > 0]
+        self.local_max = local_max
+        self._denied_until: Dict[str, float] = {}
+        self._script = redis_cli.register_script(TOKEN_BUCKET_LUA)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.tiers)
+
+    def _local_wait(self, ident: str) -> float:
+        until = self._denied_until.get(ident)
+        if until is None:
+            return 0.0
+        wait = until - time.monotonic()
+        if wait <= 0:
+            self._denied_until.pop(ident, None)
+            return 0.0
+        return wait
+
+    def _remember_denial(self, ident: str, wait: float) -> None:
+        if len(self._denied_until) >= self.local_max:
+            now = time.monotonic()
+            self._denied_until = {k: v for k, v in self._denied_until.items() if v > now}
+            if len(self._denied_until) >= self.local_max:
+                self._denied_until.clear()
+        self._denied_until[ident] = time.monotonic() + wait
+
+    async def acquire(self, ident: str, cost: int = 1) -> float:
+        """0 — пропускаем, иначе сколько секунд ждать. Redis недоступен — пропускаем."""
+        if not self.enabled:
+            return 0.0
+        wait = self._local_wait(ident)
+        if wait > 0:
+            RATE_LIMIT.labels(self.scope, "local_denied").inc()
+            return wait
+
+        keys = [f"rl:{self.scope}:{i}:{ident}" for i in range(len(self.tiers))]
+        args = [cost]
+        for cap, rate in self.tiers:
+            args += [cap, rate]
+        try:
+            with REDIS_LATENCY.labels("ratelimit").time():
+                allowed, wait_raw = await self._script(keys=keys, args=args)
+        except Exception as e:
+            # лимитер не должен класть создание ссылок вместе с Redis
+            RATE_LIMIT.labels(self.scope, "error").inc()
+            logger.warning("Rate limiter %s unavailable: %s", self.scope, e)
+            return 0.0
+
+        if int(allowed):
+            RATE_LIMIT.labels(self.scope, "allowed").inc()
+            return 0.0
+        wait = float(wait_raw)
+        self._remember_denial(ident, wait)
+        RATE_LIMIT.labels(self.scope, "denied").inc()
+        return wait
+
+    async def enforce(self, ident: str, cost: int = 1) -> None:
+        wait = await self.acquire(ident, cost)
+        if wait > 0:
+            raise HTTPException(
+                status_code=429,
+                detail="Rate limit exceeded",
+                headers={"Retry-After": str(max(1, int(wait + 0.999)))},
+            )
+
+
+def token_ident(token: Optional[str]) -> str:
+    # сам токен в ключи Redis не кладём
+    return hashlib.sha256((token or "").encode()).hexdigest()[:16]
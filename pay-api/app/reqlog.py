@@ -0,0 +1,204 @@
+# reqlog.py
+import re
+import sys
+import json
+import time
+import queue
+import random
+import logging
+import logging.handlers
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+from urllib.parse import parse_qsl
+
+logger = logging.getLogger("uvicorn.error")
+
+# путь -> доля логируемых запросов; пути без правила не логируются
+DEFAULT_SAMPLE_RATES: Dict[str, float] = {"/webhook": 1.0, "/webhook/": 1.0, "/create_order": 1.0}
+
+# ========= Маскирование (только в потоке логгера) =========
+# ключи, значения которых в лог не попадают целиком
+MASK_KEYS: Pattern[str] = re.compile(
+    r"^(sign|signature|api_?key|secret\d*|token|password|pass|hash)$",
+    re.IGNORECASE,
+)
+# то же для тел, которые не удалось разобрать: key=value / "key": "value"
+MASK_INLINE: List[Tuple[Pattern[str], str]] = [
+    (re.compile(r"(?i)\b(sign|signature|api_?key|secret\d*|token|password)=([^&\s]+)"), r"\1=***"),
+    (re.compile(r'(?i)"(sign|signature|api_?key|secret\d*|token|password)"\s*:\s*"[^"]*"'), r'"\1": "***"'),
+]
+
+
+def _mask_value(v: Any) -> Any:
+    s = str(v)
+    return s[:2] + "***" + s[-2:] if len(s) > 4 else "***"
+
+
+def mask(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        return {
+            k: (_mask_value(v) if isinstance(v, (str, int)) and MASK_KEYS.match(str(k)) else mask(v))
+            for k, v in obj.items()
+        }
+    if isinstance(obj, list):
+        return [mask(v) for v in obj]
+    return obj
+
+
+def mask_text(text: str) -> str:
+    for rx, repl in MASK_INLINE:
+        text = rx.sub(repl, text)
+    return text
+
+
+def render_body(raw: bytes, ctype: str, size: int) -> Any:
+    if "multipart" in ctype:
+        return f"<skipped: multipart size={size}>"
+    if size > len(raw):
+        # обрезано по body_max — разбирать нечего, только маскируем текст
+        return mask_text(raw.decode("utf-8", "replace")) + f"...<truncated size={size}>"
+    text = raw.decode("utf-8", "replace")
+    try:
+        if "application/json" in ctype:
+            return mask(json.loads(text))
+        if "application/x-www-form-urlencoded" in ctype:
+            return mask(dict(parse_qsl(text, keep_blank_values=True)))
+    except Exception:
+        pass
+    return mask_text(text)
+
+
+class JsonLineFormatter(logging.Formatter):
+    """Одна JSON-строка на запрос; разбор и маскирование тела — здесь, в потоке QueueListener."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line: Dict[str, Any] = {
+            "ts": round(record.created, 3),
+            "method": getattr(record, "method", None),
+            "path": getattr(record, "path", None),
+            "status": getattr(record, "status", None),
+            "ms": getattr(record, "ms", None),
+        }
+        raw: Optional[bytes] = getattr(record, "body", None)
+        if raw is not None:
+            try:
+                line["body"] = render_body(raw, getattr(record, "ctype", ""), getattr(record, "size", len(raw)))
+            except Exception as e:
+                line["body"] = f"<parse_error: {e.__class__.__name__}>"
+        return json.dumps(line, ensure_ascii=False, default=str)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Очередь полна — запись выбрасываем, event loop не ждёт."""
+
+    def __init__(self, q: "queue.Queue"):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # форматирование — забота listener'а
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RequestLog:
+    def __init__(
+        self,
+        enabled: bool = True,
+        body_max: int = 16384,
+        queue_max: int = 10000,
+        sample_rates: Optional[Dict[str, float]] = None,
+    ):
+        self.enabled = enabled
+        self.body_max = body_max
+        self.sample_rates = dict(DEFAULT_SAMPLE_RATES if sample_rates is None else sample_rates)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_max)
+        self.handler = _DroppingQueueHandler(self._queue)
+        self.log = logging.getLogger("payapi.requests")
+        self.log.setLevel(logging.INFO)
+        self.log.propagate = False
+        self.log.addHandler(self.handler)
+        self._listener: Optional[logging.handlers.QueueListener] = None
+
+    def start(self) -> None:
+        if self._listener is not None:
+            return
+        out = logging.StreamHandler(sys.stdout)
+        out.setFormatter(JsonLineFormatter())
+        self._listener = logging.handlers.QueueListener(self._queue, out, respect_handler_level=False)
+        self._listener.start()
+
+    def stop(self) -> None:
+        # stop() дописывает то, что уже в очереди
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+    def emit(self, **fields: Any) -> None:
+        self.log.info("request", extra=fields)
+
+
+
+class RequestLogMiddleware:
+    """
+    ASGI-мидлварь: на event loop только копим байты тела (до log.body_max)
+    и кладём запись в очередь. Решение о сэмплинге — до чтения тела.
+    """
+
+    def __init__(self, app, log: RequestLog):
+        self.app = app
+        self.log = log
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.log.enabled or scope.get("method") != "POST":
+            return await self.app(scope, receive, send)
+        rate = self.log.sample_rates.get(scope.get("path", ""))
+        if not rate or (rate < 1.0 and random.random() >= rate):
+            return await self.app(scope, receive, send)
+
+        body_max = self.log.body_max
+        chunks: List[bytes] = []
+        kept = 0
+        size = 0
+        status = 500
+
+        async def _receive():
+            nonlocal kept, size
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                if kept < body_max and chunk:
+                    part = chunk[: body_max - kept]
+                    chunks.append(part)
+                    kept += len(part)
+            return message
+
+        async def _send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, _receive, _send)
+        finally:
+            ctype = ""
+            for k, v in scope.get("headers", ()):
+                if k == b"content-type":
+                    ctype = v.decode("latin-1").lower()
+                    break
+            self.log.emit(
+                method="POST",
+                path=scope.get("path"),
+                status=status,
+                ms=round((time.perf_counter() - t0) * 1000.0, 2),
+                ctype=ctype,
+                body=b"".join(chunks),
+                size=size,
+            )
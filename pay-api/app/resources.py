@@ -0,0 +1,177 @@
+# resources.py
+import hmac
+import hashlib
+import logging
+from typing import Any, Dict, Optional
+
+import httpx
+import redis.asyncio as redis
+
+from .settings import Settings, settings
+from .breaker import BreakerConfig
+from .http_clients import ProviderHTTP
+from .publisher import EventPublisher
+from .db import Database
+from .outbox import Outbox
+from .ledger import OrderLedger
+from .dedup import WebhookDedup
+from .idempotency import IdempotencyStore
+from .paylink_cache import PayLinkCache
+from .paylink_tokens import PayLinkSigner
+from .ratelimit import RateLimiter
+from .plnk_debug import DebugCapture
+from .reqlog import RequestLog
+from .worker_stats import WorkerStats
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def _hmac_key(secret: Optional[str]) -> Optional["hmac.HMAC"]:
+    """Ключ разворачивается один раз; на запрос — .copy() + update()."""
+    return hmac.new(secret.encode(), digestmod=hashlib.sha256) if secret else None
+
+
+class Resources:
+    """
+    Всё долгоживущее, что нужно роутерам: один Redis-пул на воркер, publisher,
+    HTTP-клиенты провайдеров, outbox, HMAC-ключи. Оба роутера получают его
+    через Depends(get_resources) или берут ссылки на поля при импорте.
+    Конфиг — только из Settings: сами модули окружение не читают.
+    """
+
+    def __init__(self, cfg: Settings):
+        self.settings = cfg
+        self.redis: redis.Redis = redis.from_url(cfg.redis_url, decode_responses=True)
+
+        self.http = ProviderHTTP(
+            timeouts={
+                "freekassa": httpx.Timeout(cfg.fk_timeout_sec, connect=cfg.fk_connect_timeout_sec),
+                "paymentlnk": httpx.Timeout(cfg.plnk_timeout_sec, connect=cfg.plnk_connect_timeout_sec),
+            },
+            limits=httpx.Limits(
+                max_connections=cfg.http_max_connections,
+                max_keepalive_connections=cfg.http_max_keepalive,
+                keepalive_expiry=cfg.http_keepalive_expiry,
+            ),
+            http2=cfg.http2_enabled,
+            breaker_cfg=BreakerConfig(
+                failures=cfg.breaker_failures,
+                open_sec=cfg.breaker_open_sec,
+                half_open_probes=cfg.breaker_half_open_probes,
+                timeout_min=cfg.adaptive_timeout_min,
+                timeout_mult=cfg.adaptive_timeout_mult,
+                timeout_pct=cfg.adaptive_timeout_pct,
+                window=cfg.adaptive_window,
+                min_samples=cfg.adaptive_min_samples,
+            ),
+        )
+        self.publisher = EventPublisher(
+            cfg.rabbit_url, pool_size=cfg.rabbit_channel_pool, publish_timeout=cfg.rabbit_publish_timeout
+        )
+        self.db = Database(
+            cfg.database_url,
+            pool_min=cfg.pg_pool_min,
+            pool_max=cfg.pg_pool_max,
+            connect_timeout=cfg.pg_connect_timeout,
+        )
+        self.outbox = Outbox(
+            self.db,
+            self.publisher,
+            batch=cfg.outbox_batch,
+            poll_sec=cfg.outbox_poll_sec,
+            max_backoff_sec=cfg.outbox_max_backoff_sec,
+            retention_hours=cfg.outbox_retention_hours,
+        )
+        self.ledger = OrderLedger(
+            self.db, batch=cfg.ledger_batch, flush_ms=cfg.ledger_flush_ms, max_pending=cfg.ledger_max_pending
+        )
+        self.paylink_cache = PayLinkCache(
+            max_size=cfg.paylink_l1_max,
+            ttl_sec=cfg.paylink_l1_ttl_sec,
+            negative_ttl_sec=cfg.paylink_l1_neg_ttl_sec,
+        )
+        self.paylink_signer: Optional[PayLinkSigner] = (
+            PayLinkSigner(cfg.paylink_signing_key) if cfg.paylink_signing_key else None
+        )
+        # выдаём подписанные токены только при наличии ключа (без него — обычные, см. Settings.validate)
+        self.paylink_stateless = cfg.paylink_stateless and self.paylink_signer is not None
+        self.plnk_debug = DebugCapture(
+            maxlen=cfg.plnk_debug_ring,
+            sample_rate=cfg.plnk_debug_sample,
+            accounts=cfg.plnk_debug_accounts,
+            text_max=cfg.plnk_debug_text_max,
+        )
+        self.request_log = RequestLog(
+            enabled=cfg.log_body,
+            body_max=cfg.log_body_max,
+            queue_max=cfg.log_queue_max,
+            sample_rates=cfg.log_body_sample,
+        )
+        self.worker_stats = WorkerStats(self.local_stats, cfg.worker_stats_sec)
+
+        idem = dict(
+            ttl_sec=cfg.idemp_ttl_sec,
+            lock_ttl_sec=cfg.idemp_lock_ttl_sec,
+            wait_poll_sec=cfg.idemp_wait_poll_sec,
+        )
+        self.fk_idem = IdempotencyStore(self.redis, prefix="idem:", **idem)
+        self.plnk_idem = IdempotencyStore(self.redis, prefix="plnk:idem:", **idem)
+        self.webhook_dedup = WebhookDedup(
+            self.redis, window_sec=cfg.webhook_dedup_sec, claim_sec=cfg.webhook_dedup_claim_sec
+        )
+        self.token_limiter = RateLimiter(
+            self.redis, "token", [(cfg.rate_token_burst, cfg.rate_token_per_sec)]
+        )
+        self.status_limiter = RateLimiter(
+            self.redis, "order_status", [(cfg.rate_status_burst, cfg.rate_status_per_sec)]
+        )
+
+        self.fk_api_hmac = _hmac_key(cfg.fk_api_key)
+        self.fk_secret_hmac = _hmac_key(cfg.fk_secret_key)
+        self.plnk_start_hmac = _hmac_key((cfg.plnk_secret1 or "") + (cfg.plnk_secret2 or ""))
+
+    def local_stats(self) -> Dict[str, Any]:
+        """Счётчики этого воркера; сводка по всем — worker_stats.gather()."""
+        return {
+            "paylink_l1": self.paylink_cache.stats(),
+            "providers": {name: b.snapshot() for name, b in self.http.breakers.items()},
+            "webhook_dedup": self.webhook_dedup.stats,
+            "ledger": self.ledger.stats,
+            "publisher": self.publisher.stats,
+        }
+
+    async def start(self) -> None:
+        await self.http.start()
+        try:
+            await self.publisher.start()
+        except Exception as e:
+            # брокер может подняться позже — publish() переподключится сам
+            logger.error("RabbitMQ publisher start failed: %s", e)
+        try:
+            await self.db.start()
+        except Exception as e:
+            # без db-pay вебхуки публикуют напрямую
+            logger.error("db-pay start failed, outbox disabled: %s", e)
+        self.outbox.start()
+        self.ledger.start()
+        self.paylink_cache.start(self.redis)
+        self.plnk_debug.start(self.redis)
+        self.worker_stats.start(self.redis)
+
+    async def close(self) -> None:
+        await self.worker_stats.close()
+        await self.plnk_debug.close()
+        await self.paylink_cache.close()
+        await self.outbox.close()
+        await self.ledger.close()
+        await self.db.close()
+        await self.publisher.close()
+        await self.http.close()
+        await self.redis.aclose()
+
+
+resources = Resources(settings)
+
+
+def get_resources() -> Resources:
+    return resources
@@ -0,0 +1,47 @@
+# serialization.py
+"""
+JSON для ответов, значений в Redis и тел сообщений RabbitMQ.
+
+orjson, если установлен, иначе stdlib json — формат на выходе один и тот же
+(UTF-8 без \\u-экранирования, как json.dumps(..., ensure_ascii=False)).
+"""
+import json
+from typing import Any, Dict, Union
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - зависит от окружения
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+# ===== заголовки сообщений в payments.events =====
+# потребитель выбирает декодер по (content_type, версия); без заголовков — это JSON v1
+EVENT_CONTENT_TYPE = "application/json"
+EVENT_VERSION_HEADER = "x-event-version"
+EVENT_SCHEMA_VERSION = "1"
+EVENT_HEADERS: Dict[str, str] = {EVENT_VERSION_HEADER: EVENT_SCHEMA_VERSION}
+
+
+if orjson is not None:
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    def loads(raw: Union[bytes, str]) -> Any:
+        # orjson.JSONDecodeError — наследник ValueError, как и у stdlib
+        return orjson.loads(raw)
+else:
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def loads(raw: Union[bytes, str]) -> Any:
+        return json.loads(raw)
+
+
+class FastJSONResponse(JSONResponse):
+    """default_response_class для FastAPI: тот же JSONResponse, рендер через dumps()."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
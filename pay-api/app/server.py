@@ -0,0 +1,101 @@
+# server.py
+"""
+Запуск pay-api в проде: python -m app.server
+
+N воркеров uvicorn под его супервизором (uvloop + httptools). Воркеры
+стартуют через spawn: каждый сам импортирует app.main и в lifespan
+поднимает свои пулы (Redis, RabbitMQ, httpx, aiopg) — после форка, не до.
+SIGHUP — перезапуск воркеров по одному без разрыва слушающего сокета,
+SIGTERM — graceful shutdown.
+"""
+import os
+import math
+import shutil
+import logging
+from typing import Optional
+
+import uvicorn
+
+# только конфиг: app.main супервизор не импортирует
+from .settings import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit() -> Optional[float]:
+    """Лимит CPU контейнера в ядрах (cgroup v2, затем v1); None — лимита нет."""
+    raw = _read("/sys/fs/cgroup/cpu.max")
+    if raw:
+        quota, _, period = raw.partition(" ")
+        if quota != "max" and period:
+            return int(quota) / int(period)
+        return None
+    quota = _read("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")
+    period = _read("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+
+def worker_count() -> int:
+    if settings.web_concurrency:
+        return settings.web_concurrency
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, math.ceil(limit))
+    return max(1, min(cpus, settings.max_workers))
+
+
+def _impl(module: str, name: str) -> str:
+    try:
+        __import__(module)
+    except ImportError:
+        logger.warning("%s not installed, falling back to asyncio/h11 defaults", module)
+        return "auto"
+    return name
+
+
+def _prepare_multiproc_metrics(workers: int) -> None:
+    # у каждого воркера свои счётчики — prometheus_client сводит их через файлы в каталоге
+    path = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if not path and workers > 1:
+        path = os.environ["PROMETHEUS_MULTIPROC_DIR"] = "/tmp/payapi-prometheus"
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:     %(message)s")
+    workers = worker_count()
+    _prepare_multiproc_metrics(workers)
+    logger.info("Starting pay-api: workers=%s (cpu limit=%s)", workers, cgroup_cpu_limit())
+    uvicorn.run(
+        "app.main:app",
+        host=settings.host,
+        port=settings.port,
+        workers=workers,
+        loop=_impl("uvloop", "uvloop"),
+        http=_impl("httptools", "httptools"),
+        proxy_headers=True,
+        forwarded_allow_ips=settings.forwarded_allow_ips,
+        timeout_keep_alive=settings.uvicorn_keepalive_timeout,
+        timeout_graceful_shutdown=settings.uvicorn_graceful_timeout,
+        log_level=settings.uvicorn_log_level,
+    )
+
+
+if __name__ == "__main__":
+    main()
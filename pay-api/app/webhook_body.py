@@ -0,0 +1,63 @@
+# webhook_body.py
+from typing import Any, Dict, Tuple
+from urllib.parse import parse_qsl
+
+from fastapi import HTTPException, Request
+
+from .serialization import loads
+
+# колбэки провайдеров — десятки полей; всё, что больше, не вебхук (Settings.webhook_body_max)
+WEBHOOK_BODY_MAX = 65536
+
+Payload = Dict[str, Any]
+
+
+def parse_webhook_body(raw: bytes, ctype: str) -> Tuple[Payload, Payload]:
+    """
+    (payload как пришёл, payload с ключами в нижнем регистре) за один проход.
+    JSON — если так сказано в content-type, иначе x-www-form-urlencoded.
+    """
+    payload: Payload = {}
+    lowered: Payload = {}
+    if "json" in ctype:
+        try:
+            obj = loads(raw)
+        except ValueError:
+            raise HTTPException(400, "Invalid JSON")
+        if not isinstance(obj, dict):
+            raise HTTPException(400, "Invalid JSON")
+        # ключи JSON-объекта всегда строки
+        return obj, {k.lower(): v for k, v in obj.items()}
+
+    for k, v in parse_qsl(raw.decode("utf-8", "replace"), keep_blank_values=True):
+        payload[k] = v
+        lowered[k.lower()] = v
+    return payload, lowered
+
+
+async def read_webhook_payload(request: Request, limit: int = WEBHOOK_BODY_MAX) -> Tuple[Payload, Payload]:
+    """Тело вебхука с лимитом размера, без multipart-парсера Starlette."""
+    headers = request.headers
+    ctype = (headers.get("content-type") or "").lower()
+    if "multipart/form-data" in ctype:
+        # провайдеры так не шлют, но старое поведение сохраняем
+        form = await request.form()
+        payload = dict(form)
+        return payload, {(k.lower() if isinstance(k, str) else k): v for k, v in payload.items()}
+
+    declared = headers.get("content-length")
+    if declared and declared.isdigit():
+        if int(declared) > limit:
+            raise HTTPException(413, "Webhook body too large")
+        # длину тела сервер сверяет с Content-Length сам
+        return parse_webhook_body(await request.body(), ctype)
+
+    # chunked без Content-Length — считаем по ходу чтения
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            raise HTTPException(413, "Webhook body too large")
+        chunks.append(chunk)
+    return parse_webhook_body(b"".join(chunks), ctype)
@@ -0,0 +1,80 @@
+# worker_stats.py
+import os
+import socket
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Optional
+
+import redis.asyncio as redis
+
+from .serialization import dumps, loads
+
+logger = logging.getLogger("uvicorn.error")
+
+WORKER_STATS_PREFIX = "payapi:stats:"
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkerStats:
+    """
+    Счётчики кэшей, breaker'ов, publisher'а и журнала живут в памяти воркера.
+    Каждый воркер раз в interval_sec кладёт свой снимок в Redis (TTL — три интервала,
+    умерший воркер пропадает сам); /internal/cache_stats отдаёт снимки всех воркеров и подов.
+    """
+
+    def __init__(self, collect: Callable[[], Dict[str, Any]], interval_sec: int):
+        self.collect = collect
+        self.interval_sec = interval_sec
+        self.worker = worker_id()
+        self.redis: Optional[redis.Redis] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def publish(self) -> None:
+        await self.redis.set(WORKER_STATS_PREFIX + self.worker, dumps(self.collect()), ex=self.interval_sec * 3)
+
+    async def gather(self) -> Dict[str, Any]:
+        """worker -> снимок; свой воркер — свежий, остальные — не старше interval_sec."""
+        workers: Dict[str, Any] = {}
+        if self.redis is not None:
+            try:
+                keys = [k async for k in self.redis.scan_iter(match=WORKER_STATS_PREFIX + "*", count=100)]
+                for key, raw in zip(keys, await self.redis.mget(keys) if keys else []):
+                    if raw:
+                        workers[key[len(WORKER_STATS_PREFIX):]] = loads(raw)
+            except Exception as e:
+                logger.warning("Worker stats gather failed, local only: %s", e)
+        workers[self.worker] = self.collect()
+        return workers
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.publish()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Worker stats publish failed: %s", e)
+            await asyncio.sleep(self.interval_sec)
+
+    def start(self, redis_cli: redis.Redis) -> None:
+        self.redis = redis_cli
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        if self.redis is not None:
+            try:
+                await self.redis.delete(WORKER_STATS_PREFIX + self.worker)
+            except Exception:
+                pass
+            self.redis = None
@@ -0,0 +1,87 @@
+# bench_serialization.py
+"""
+stdlib json (как было) против app.serialization (orjson) на наших типичных данных:
+событие вебхука в payments.events, запись paylink в Redis, ответ create_link.
+
+    python -m bench.bench_serialization [-n 100000]
+"""
+import json
+import time
+import argparse
+
+from fastapi.responses import JSONResponse
+
+from app.serialization import BACKEND, FastJSONResponse, dumps, loads
+
+SCI_EVENT = {
+    "provider": "freekassa",
+    "schema": "sci",
+    "order_id": "JIG-20251213-01",
+    "amount": "1500.00",
+    "currency": "36",
+    "status": "success",
+    "raw": {
+        "MERCHANT_ID": "66169",
+        "AMOUNT": "1500.00",
+        "intid": "123456789",
+        "MERCHANT_ORDER_ID": "JIG-20251213-01",
+        "P_EMAIL": "покупатель@example.com",
+        "P_PHONE": "",
+        "CUR_ID": "36",
+        "SIGN": "0f3c2a5d4e6b7a8c9d0e1f2a3b4c5d6e",
+        "us_tag": "tg",
+        "payer_account": "220000******0000",
+    },
+    "event_key": "fk:123456789",
+}
+
+PAYLINK = {"fk_url": "https://pay.fk.money/form/987654/0f3c2a5d4e6b7a8c", "expires_at": "2025-12-14T10:00:00.000000Z"}
+
+CREATE_LINK_RESPONSE = {
+    "order_id": "JIG-20251213-01",
+    "fk_order_id": 987654,
+    "fk_order_hash": "0f3c2a5d4e6b7a8c",
+    "fk_url": "https://pay.fk.money/form/987654/0f3c2a5d4e6b7a8c",
+    "token": "2f1d9b0c7a6e4b1f8c3d2e1a0b9c8d7e",
+    "link": "https://pay.example.com/pay/2f1d9b0c7a6e4b1f8c3d2e1a0b9c8d7e",
+    "expires_at": "2025-12-14T10:00:00.000000Z",
+}
+
+
+def old_dumps(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False).encode()
+
+
+def timeit(fn, arg, n: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn(arg)
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def row(name: str, old_us: float, new_us: float) -> None:
+    print(f"{name:<28} {old_us:8.2f} {new_us:8.2f}   x{old_us / new_us:.2f}")
+
+
+def main(n: int) -> None:
+    print(f"backend: {BACKEND}\n")
+    print(f"{'us/call':<28} {'json':>8} {BACKEND:>8}")
+    for label, obj in (("event", SCI_EVENT), ("paylink", PAYLINK), ("create_link", CREATE_LINK_RESPONSE)):
+        # формат совместим в обе стороны
+        assert loads(old_dumps(obj)) == obj and json.loads(dumps(obj)) == obj
+        row(f"{label}: dumps", timeit(old_dumps, obj, n), timeit(dumps, obj, n))
+        encoded = old_dumps(obj)
+        row(f"{label}: loads", timeit(json.loads, encoded, n), timeit(loads, encoded, n))
+
+    # рендер ответа FastAPI (без jsonable_encoder — он одинаковый для обоих)
+    row(
+        "response render",
+        timeit(JSONResponse(None).render, CREATE_LINK_RESPONSE, n),
+        timeit(FastJSONResponse(None).render, CREATE_LINK_RESPONSE, n),
+    )
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("-n", type=int, default=100000)
+    main(p.parse_args().n)
@@ -0,0 +1,92 @@
+# bench_webhook_parse.py
+"""
+Разбор тела вебхука: Starlette request.form() + два dict-а (как было) против webhook_body.
+
+    python -m bench.bench_webhook_parse [-n 20000]
+"""
+import time
+import asyncio
+import argparse
+from urllib.parse import urlencode
+
+from starlette.requests import Request
+
+from app.webhook_body import read_webhook_payload
+
+SCI_BODY = urlencode({
+    "MERCHANT_ID": "66169",
+    "AMOUNT": "1500.00",
+    "intid": "123456789",
+    "MERCHANT_ORDER_ID": "JIG-20251213-01",
+    "P_EMAIL": "buyer@example.com",
+    "P_PHONE": "",
+    "CUR_ID": "36",
+    "SIGN": "0f3c2a5d4e6b7a8c9d0e1f2a3b4c5d6e",
+    "us_tag": "tg",
+    "payer_account": "220000******0000",
+}).encode()
+
+JSON_BODY = (
+    b'{"paymentId":"ord-1","orderId":"987654","amount":"1500.00","currency":"RUB",'
+    b'"status":"success","intid":"123456789","sign":"0f3c2a5d4e6b7a8c9d0e1f2a3b4c5d6e"}'
+)
+
+
+def _request(body: bytes, ctype: bytes) -> Request:
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/webhook",
+        "headers": [(b"content-type", ctype), (b"content-length", str(len(body)).encode())],
+    }
+    return Request(scope, receive)
+
+
+async def old_path(body: bytes, ctype: bytes):
+    request = _request(body, ctype)
+    if b"application/json" in ctype:
+        payload = await request.json()
+    else:
+        form = await request.form()
+        payload = dict(form)
+    d = {(k.lower() if isinstance(k, str) else k): v for k, v in payload.items()}
+    return payload, d
+
+
+async def new_path(body: bytes, ctype: bytes):
+    return await read_webhook_payload(_request(body, ctype))
+
+
+async def bench(name: str, fn, body: bytes, ctype: bytes, n: int) -> float:
+    assert (await fn(body, ctype))[1] == (await old_path(body, ctype))[1]
+    t0 = time.perf_counter()
+    for _ in range(n):
+        await fn(body, ctype)
+    per_call_us = (time.perf_counter() - t0) / n * 1e6
+    print(f"{name:<28} {per_call_us:8.2f} us/call")
+    return per_call_us
+
+
+async def main(n: int) -> None:
+    for label, body, ctype in (
+        ("form", SCI_BODY, b"application/x-www-form-urlencoded"),
+        ("json", JSON_BODY, b"application/json"),
+    ):
+        old = await bench(f"{label}: request.form/json", old_path, body, ctype, n)
+        new = await bench(f"{label}: webhook_body", new_path, body, ctype, n)
+        print(f"{label}: x{old / new:.2f}\n")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("-n", type=int, default=20000)
+    asyncio.run(main(p.parse_args().n))
@@ -0,0 +1,42 @@
+# payloads.py
+"""Тела колбэков провайдеров с правильными подписями (для заглушек и генератора нагрузки)."""
+import hmac
+import uuid
+import hashlib
+from typing import Dict
+
+
+def fk_sci_webhook(merchant_id: str, secret2: str, order_id: str, amount: str) -> Dict[str, str]:
+    sign = hashlib.md5(f"{merchant_id}:{amount}:{secret2}:{order_id}".encode()).hexdigest()
+    return {
+        "MERCHANT_ID": merchant_id,
+        "AMOUNT": amount,
+        "MERCHANT_ORDER_ID": order_id,
+        "SIGN": sign,
+        "intid": uuid.uuid4().hex[:12],
+        "CUR_ID": "36",
+    }
+
+
+def fk_v1_webhook(secret_key: str, payment_id: str, amount: str, currency: str = "RUB") -> Dict[str, str]:
+    payload = f"{payment_id}:{amount}:{currency}:{secret_key}".encode()
+    sign = hmac.new(secret_key.encode(), payload, hashlib.sha256).hexdigest()
+    return {
+        "paymentId": payment_id,
+        "amount": amount,
+        "currency": currency,
+        "status": "success",
+        "intid": uuid.uuid4().hex[:12],
+        "sign": sign,
+    }
+
+
+def plnk_status_callback(account: str, number: str, amount: str, status: str = "ok") -> Dict[str, str]:
+    return {
+        "status": status,
+        "number": number,
+        "account": account,
+        "amount": amount,
+        "amountcurr": "RUB",
+        "transID": uuid.uuid4().hex[:12],
+    }
@@ -0,0 +1,187 @@
+# run.py
+"""
+Генератор нагрузки на pay-api (чистый asyncio + httpx, закрытый цикл).
+
+    python -m loadtest.run --target http://localhost:8001 --scenario create_link -c 50 -d 30
+    python -m loadtest.run --scenario mixed --json
+
+Сценарии:
+    create_link     POST /internal/create_link (FreeKassa)
+    create_link_v2  POST /v2/internal/create_link (paymentlnk)
+    redirect        GET /pay/{token} по заранее созданным ссылкам
+    webhook_sci     POST /webhook (SCI, подпись MD5)
+    webhook_v1      POST /webhook (API v1, HMAC)
+    plnk_status     POST /v2/status
+    mixed           всё вперемешку (веса в MIXED)
+
+Секреты — те же переменные окружения, что у pay-api (FREKASSA_*, PLNK_ACCOUNT, PAY_INTERNAL_TOKEN).
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from collections import Counter, defaultdict
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+import httpx
+
+from .payloads import fk_sci_webhook, fk_v1_webhook, plnk_status_callback
+
+INTERNAL_TOKEN = os.getenv("PAY_INTERNAL_TOKEN", "")
+MERCHANT_ID = os.getenv("FREKASSA_MERCHANT_ID", "1")
+SECRET_KEY = os.getenv("FREKASSA_SECRET_KEY", "")
+SECRET2 = os.getenv("FREKASSA_SECRET2", "")
+PLNK_ACCOUNT = os.getenv("PLNK_ACCOUNT", "")
+
+MIXED = {"create_link": 2, "redirect": 10, "webhook_sci": 3, "plnk_status": 1}
+
+Op = Callable[[httpx.AsyncClient], Awaitable[int]]
+
+
+def _amount() -> str:
+    return f"{random.randint(100, 5000)}.00"
+
+
+def _internal_headers() -> Dict[str, str]:
+    h = {"X-Idempotency-Key": uuid.uuid4().hex}
+    if INTERNAL_TOKEN:
+        h["X-Internal-Token"] = INTERNAL_TOKEN
+    return h
+
+
+class Scenarios:
+    def __init__(self):
+        self.tokens: List[str] = []
+
+    async def create_link(self, c: httpx.AsyncClient) -> int:
+        r = await c.post(
+            "/internal/create_link",
+            json={"amount": float(_amount()), "email": "load@test.local", "ip": "127.0.0.1",
+                  "payment_id": f"lt-{uuid.uuid4().hex[:16]}"},
+            headers=_internal_headers(),
+        )
+        if r.status_code == 200:
+            token = r.json().get("token")
+            if token and len(self.tokens) < 10000:
+                self.tokens.append(token)
+        return r.status_code
+
+    async def create_link_v2(self, c: httpx.AsyncClient) -> int:
+        r = await c.post(
+            "/v2/internal/create_link",
+            json={"amount": float(_amount()), "payment_id": f"lt-{uuid.uuid4().hex[:16]}"},
+            headers=_internal_headers(),
+        )
+        return r.status_code
+
+    async def redirect(self, c: httpx.AsyncClient) -> int:
+        token = random.choice(self.tokens) if self.tokens else uuid.uuid4().hex
+        r = await c.get(f"/pay/{token}")
+        return r.status_code
+
+    async def webhook_sci(self, c: httpx.AsyncClient) -> int:
+        r = await c.post("/webhook", data=fk_sci_webhook(MERCHANT_ID, SECRET2, f"lt-{uuid.uuid4().hex[:16]}", _amount()))
+        return r.status_code
+
+    async def webhook_v1(self, c: httpx.AsyncClient) -> int:
+        r = await c.post("/webhook", data=fk_v1_webhook(SECRET_KEY, f"lt-{uuid.uuid4().hex[:16]}", _amount()))
+        return r.status_code
+
+    async def plnk_status(self, c: httpx.AsyncClient) -> int:
+        r = await c.post("/v2/status", data=plnk_status_callback(PLNK_ACCOUNT, f"plnk-lt-{uuid.uuid4().hex[:12]}", _amount()))
+        return r.status_code
+
+
+def percentile(sorted_vals: List[float], pct: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    idx = min(len(sorted_vals) - 1, max(0, int(round(pct / 100.0 * len(sorted_vals))) - 1))
+    return sorted_vals[idx]
+
+
+async def run(args) -> Dict[str, Dict[str, float]]:
+    sc = Scenarios()
+    names = list(MIXED) if args.scenario == "mixed" else [args.scenario]
+    weights = [MIXED[n] for n in names] if args.scenario == "mixed" else [1]
+    ops: Dict[str, Op] = {n: getattr(sc, n) for n in names}
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, Counter] = defaultdict(Counter)
+
+    async with httpx.AsyncClient(base_url=args.target, limits=limits, timeout=args.timeout) as c:
+        if "redirect" in names:
+            # ссылки для редиректов готовим заранее и в замеры не включаем
+            await asyncio.gather(*(sc.create_link(c) for _ in range(args.links)), return_exceptions=True)
+            print(f"prepared {len(sc.tokens)} links", file=sys.stderr)
+
+        deadline = time.perf_counter() + args.duration
+        budget = [args.requests] if args.requests else None
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                if budget is not None:
+                    if budget[0] <= 0:
+                        return
+                    budget[0] -= 1
+                name = random.choices(names, weights)[0]
+                t0 = time.perf_counter()
+                try:
+                    status = str(await ops[name](c))
+                except httpx.HTTPError as e:
+                    status = e.__class__.__name__
+                latencies[name].append(time.perf_counter() - t0)
+                statuses[name][status] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    report: Dict[str, Dict[str, float]] = {}
+    for name in names:
+        vals = sorted(latencies[name])
+        report[name] = {
+            "requests": len(vals),
+            "rps": round(len(vals) / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(percentile(vals, 50) * 1000, 2),
+            "p90_ms": round(percentile(vals, 90) * 1000, 2),
+            "p99_ms": round(percentile(vals, 99) * 1000, 2),
+            "max_ms": round((vals[-1] if vals else 0) * 1000, 2),
+            "statuses": dict(statuses[name]),
+        }
+    return report
+
+
+def _print_table(report: Dict[str, Dict[str, float]]) -> None:
+    cols: Tuple[str, ...] = ("requests", "rps", "p50_ms", "p90_ms", "p99_ms", "max_ms")
+    print(f"{'scenario':<16}" + "".join(f"{c:>10}" for c in cols) + "  statuses")
+    for name, row in report.items():
+        print(f"{name:<16}" + "".join(f"{row[c]:>10}" for c in cols) + f"  {row['statuses']}")
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="pay-api load generator")
+    p.add_argument("--target", default=os.getenv("LOADTEST_TARGET", "http://localhost:8001"))
+    p.add_argument("--scenario", default="mixed",
+                   choices=["create_link", "create_link_v2", "redirect", "webhook_sci", "webhook_v1", "plnk_status", "mixed"])
+    p.add_argument("-c", "--concurrency", type=int, default=32)
+    p.add_argument("-d", "--duration", type=float, default=30.0, help="секунд")
+    p.add_argument("-n", "--requests", type=int, default=0, help="остановиться после N запросов")
+    p.add_argument("--links", type=int, default=200, help="ссылок для сценария redirect")
+    p.add_argument("--timeout", type=float, default=30.0)
+    p.add_argument("--json", action="store_true", help="отчёт одной JSON-строкой")
+    args = p.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False))
+    else:
+        _print_table(report)
+
+
+if __name__ == "__main__":
+    main()
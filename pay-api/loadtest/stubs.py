@@ -0,0 +1,184 @@
+# stubs.py
+"""
+Заглушки FreeKassa и paymentlnk для нагрузочных прогонов без сети.
+
+    python -m loadtest.stubs            # :9000
+    FREKASSA_BASE_URL=http://localhost:9000/fk/v1/
+    PAYMENTLNK_BASE_URL=http://localhost:9000/plnk/api/
+
+Задержка ответа — логнормальная (медиана STUB_LATENCY_MS, разброс STUB_LATENCY_SIGMA),
+доля 5xx — STUB_ERROR_RATE, доля зависаний — STUB_TIMEOUT_RATE. Всё это меняется
+на лету через POST /_stub/config. Если задан STUB_CALLBACK_URL, после создания заказа
+заглушка шлёт в pay-api колбэк (SCI / v1 / paymentlnk status) с верной подписью.
+"""
+import os
+import random
+import asyncio
+import logging
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional, Set
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, RedirectResponse
+from pydantic import BaseModel
+
+from .payloads import fk_sci_webhook, fk_v1_webhook, plnk_status_callback
+
+logger = logging.getLogger("uvicorn.error")
+
+STUB_PORT = int(os.getenv("STUB_PORT", "9000"))
+STUB_PUBLIC_URL = os.getenv("STUB_PUBLIC_URL", f"http://localhost:{STUB_PORT}")
+STUB_CALLBACK_URL = os.getenv("STUB_CALLBACK_URL", "").rstrip("/")
+
+MERCHANT_ID = os.getenv("FREKASSA_MERCHANT_ID", "1")
+SECRET_KEY = os.getenv("FREKASSA_SECRET_KEY", "")
+SECRET2 = os.getenv("FREKASSA_SECRET2", "")
+PLNK_ACCOUNT = os.getenv("PLNK_ACCOUNT", "")
+
+
+class StubConfig(BaseModel):
+    latency_ms: float = float(os.getenv("STUB_LATENCY_MS", "80"))
+    latency_sigma: float = float(os.getenv("STUB_LATENCY_SIGMA", "0.5"))
+    error_rate: float = float(os.getenv("STUB_ERROR_RATE", "0"))
+    timeout_rate: float = float(os.getenv("STUB_TIMEOUT_RATE", "0"))
+    timeout_sec: float = float(os.getenv("STUB_TIMEOUT_SEC", "30"))
+    callback_delay_ms: float = float(os.getenv("STUB_CALLBACK_DELAY_MS", "200"))
+    # sci | v1 — какой вебхук FreeKassa слать
+    fk_callback: str = os.getenv("STUB_FK_CALLBACK", "sci")
+
+
+cfg = StubConfig()
+stats: Counter = Counter()
+_callbacks: Optional[httpx.AsyncClient] = None
+_pending: Set[asyncio.Task] = set()
+# paymentId -> заказ, для /fk/v1/orders (сверка статусов)
+_fk_orders: Dict[str, Dict[str, Any]] = {}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _callbacks
+    _callbacks = httpx.AsyncClient(timeout=10)
+    try:
+        yield
+    finally:
+        await _callbacks.aclose()
+
+
+app = FastAPI(title="provider stubs", lifespan=lifespan)
+
+
+async def _simulate(name: str) -> Optional[JSONResponse]:
+    """Задержка + случайный отказ. None — отвечаем нормально."""
+    stats[f"{name}.requests"] += 1
+    roll = random.random()
+    if roll < cfg.timeout_rate:
+        stats[f"{name}.timeouts"] += 1
+        await asyncio.sleep(cfg.timeout_sec)
+    elif cfg.latency_ms > 0:
+        await asyncio.sleep(random.lognormvariate(0, cfg.latency_sigma) * cfg.latency_ms / 1000.0)
+    if roll < cfg.timeout_rate + cfg.error_rate:
+        stats[f"{name}.errors"] += 1
+        return JSONResponse({"type": "error", "message": "stub failure"}, status_code=503)
+    return None
+
+
+def _callback(path: str, data: Dict[str, str]) -> None:
+    if not STUB_CALLBACK_URL:
+        return
+
+    async def _send():
+        await asyncio.sleep(cfg.callback_delay_ms / 1000.0)
+        try:
+            r = await _callbacks.post(STUB_CALLBACK_URL + path, data=data)
+            stats[f"callback.{r.status_code}"] += 1
+        except httpx.HTTPError as e:
+            stats["callback.error"] += 1
+            logger.warning("stub callback %s failed: %s", path, e)
+
+    task = asyncio.create_task(_send())
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+
+# ========= FreeKassa =========
+@app.post("/fk/v1/orders/create")
+async def fk_orders_create(request: Request):
+    failed = await _simulate("fk.orders_create")
+    if failed:
+        return failed
+    body = await request.json()
+    payment_id = str(body.get("paymentId") or "")
+    amount = str(body.get("amount") or "0.00")
+    order_id = random.randint(10**8, 10**9)
+    if len(_fk_orders) < 100000:
+        _fk_orders[payment_id] = {"merchant_order_id": payment_id, "fk_order_id": order_id,
+                                  "amount": amount, "currency": "RUB", "status": 1}
+    if cfg.fk_callback == "v1":
+        _callback("/webhook", fk_v1_webhook(SECRET_KEY, payment_id, amount))
+    else:
+        _callback("/webhook", fk_sci_webhook(MERCHANT_ID, SECRET2, payment_id, amount))
+    return {
+        "type": "success",
+        "orderId": order_id,
+        "orderHash": f"{order_id:x}",
+        "location": f"{STUB_PUBLIC_URL}/fk/pay/{order_id}",
+    }
+
+
+@app.post("/fk/v1/orders")
+async def fk_orders(request: Request):
+    failed = await _simulate("fk.orders")
+    if failed:
+        return failed
+    body = await request.json()
+    order = _fk_orders.get(str(body.get("paymentId") or ""))
+    return {"type": "success", "pages": 1, "orders": [order] if order else []}
+
+
+# ========= paymentlnk =========
+@app.post("/plnk/api/payment/invoice")
+async def plnk_invoice(request: Request):
+    failed = await _simulate("plnk.invoice")
+    if failed:
+        return failed
+    form = await request.form()
+    number = str(form.get("number") or "")
+    trans_id = random.randint(10**8, 10**9)
+    _callback("/v2/status", plnk_status_callback(PLNK_ACCOUNT, number, str(form.get("amount") or "")))
+    return {"status": "wait", "payURL": f"{STUB_PUBLIC_URL}/plnk/pay/{trans_id}", "transID": trans_id}
+
+
+@app.post("/plnk/api/payment/start")
+async def plnk_start(request: Request):
+    failed = await _simulate("plnk.start")
+    if failed:
+        return failed
+    form = await request.form()
+    _callback("/v2/status", plnk_status_callback(PLNK_ACCOUNT, str(form.get("number") or ""), str(form.get("amount") or "")))
+    return RedirectResponse(f"{STUB_PUBLIC_URL}/plnk/pay/{random.randint(10**8, 10**9)}", status_code=302)
+
+
+# ========= управление =========
+@app.get("/_stub/config")
+async def get_config() -> Dict[str, Any]:
+    return cfg.model_dump()
+
+
+@app.post("/_stub/config")
+async def set_config(new: StubConfig) -> Dict[str, Any]:
+    global cfg
+    cfg = new
+    return cfg.model_dump()
+
+
+@app.get("/_stub/stats")
+async def get_stats() -> Dict[str, int]:
+    return dict(stats)
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="0.0.0.0", port=STUB_PORT, log_level="warning")
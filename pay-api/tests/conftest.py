@@ -0,0 +1,16 @@
+import fakeredis
+import pytest
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def redis_cli():
+    """Redis в памяти процесса (Lua — через lupa): Lua-скрипты лимитера и локов работают как в бою."""
+    cli = fakeredis.FakeAsyncRedis(decode_responses=True)
+    yield cli
+    await cli.flushall()
+    await cli.aclose()
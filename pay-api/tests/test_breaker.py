@@ -0,0 +1,109 @@
+import pytest
+
+from app import breaker as breaker_mod
+from app.breaker import CLOSED, HALF_OPEN, OPEN, BreakerConfig, CircuitBreaker, CircuitOpen
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(breaker_mod.time, "monotonic", c)
+    return c
+
+
+def _breaker(**kw) -> CircuitBreaker:
+    cfg = BreakerConfig(**{"failures": 3, "open_sec": 10.0, "half_open_probes": 1, **kw})
+    return CircuitBreaker("test", max_timeout=15.0, cfg=cfg)
+
+
+def _fail(b: CircuitBreaker, n: int) -> None:
+    for _ in range(n):
+        b.before_call()
+        b.on_failure()
+
+
+def test_opens_after_consecutive_failures(clock):
+    b = _breaker()
+    _fail(b, 2)
+    assert b.state == CLOSED
+    _fail(b, 1)
+    assert b.state == OPEN
+
+    with pytest.raises(CircuitOpen) as e:
+        b.before_call()
+    assert e.value.retry_after == pytest.approx(10.0)
+    assert b.rejected == 1
+
+
+def test_success_resets_failure_count(clock):
+    b = _breaker()
+    _fail(b, 2)
+    b.before_call()
+    b.on_success(0.1)
+    _fail(b, 2)
+    assert b.state == CLOSED
+
+
+def test_half_open_probe_closes_on_success(clock):
+    b = _breaker()
+    _fail(b, 3)
+    clock.now += 10.0
+
+    b.before_call()
+    assert b.state == HALF_OPEN
+    # пока проба в полёте, остальные получают отказ
+    with pytest.raises(CircuitOpen):
+        b.before_call()
+
+    b.on_success(0.2)
+    assert b.state == CLOSED
+    b.before_call()
+
+
+def test_half_open_probe_failure_reopens(clock):
+    b = _breaker()
+    _fail(b, 3)
+    clock.now += 10.0
+
+    b.before_call()
+    b.on_failure()
+    assert b.state == OPEN
+    with pytest.raises(CircuitOpen) as e:
+        b.before_call()
+    assert e.value.retry_after == pytest.approx(10.0)
+
+
+def test_aborted_probe_frees_slot(clock):
+    b = _breaker()
+    _fail(b, 3)
+    clock.now += 10.0
+
+    b.before_call()
+    b.on_abort()
+    b.before_call()
+    assert b.state == HALF_OPEN
+
+
+def test_adaptive_timeout_follows_latency(clock):
+    b = _breaker(min_samples=5, timeout_mult=3.0, timeout_min=0.5)
+    assert b.timeout() == 15.0  # мало замеров — потолок
+
+    for _ in range(10):
+        b.on_success(0.4)
+    assert b.timeout() == pytest.approx(1.2)
+
+    for _ in range(10):
+        b.on_success(0.01)
+    assert b.timeout() == pytest.approx(1.2)  # p99 держится за медленные ответы в окне
+
+    for _ in range(10):
+        b.on_success(20.0)
+    assert b.timeout() == 15.0
@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+from app.idempotency import IdempotencyStore
+
+pytestmark = pytest.mark.anyio
+
+
+def _store(redis_cli, **kw) -> IdempotencyStore:
+    return IdempotencyStore(redis_cli, prefix="t:idem:", wait_poll_sec=0.01, **kw)
+
+
+def _cached_call(store: IdempotencyStore, key: str, calls: list, gate: asyncio.Event = None):
+    """fn как в роутерах: сначала кэш, потом «провайдер» и запись результата."""
+    async def fn():
+        hit = await store.get(key, count=False)
+        if hit is not None:
+            return hit
+        calls.append(key)
+        if gate is not None:
+            await gate.wait()
+        result = {"order": key, "n": len(calls)}
+        await store.set(key, result)
+        return result
+    return fn
+
+
+async def test_concurrent_calls_in_worker_share_one_flight(redis_cli):
+    store = _store(redis_cli)
+    calls: list = []
+    gate = asyncio.Event()
+    fn = _cached_call(store, "k1", calls, gate)
+
+    tasks = [asyncio.create_task(store.run_once("create", "k1", fn)) for _ in range(5)]
+    await asyncio.sleep(0.05)
+    gate.set()
+    results = await asyncio.gather(*tasks)
+
+    assert calls == ["k1"]
+    assert all(r == {"order": "k1", "n": 1} for r in results)
+    assert store._inflight == {}
+    assert await redis_cli.get("t:idem:lock:create:k1") is None
+
+
+async def test_second_pod_waits_for_lock_and_gets_cached_result(redis_cli):
+    # у каждого «пода» свой _inflight, общий только Redis
+    pod_a, pod_b = _store(redis_cli), _store(redis_cli)
+    calls: list = []
+    gate = asyncio.Event()
+
+    first = asyncio.create_task(pod_a.run_once("create", "k2", _cached_call(pod_a, "k2", calls, gate)))
+    await asyncio.sleep(0.05)
+    assert await redis_cli.get("t:idem:lock:create:k2") is not None
+    second = asyncio.create_task(pod_b.run_once("create", "k2", _cached_call(pod_b, "k2", calls)))
+    await asyncio.sleep(0.05)
+    assert not second.done()
+
+    gate.set()
+    assert await first == await second == {"order": "k2", "n": 1}
+    assert calls == ["k2"]
+
+
+async def test_failure_releases_lock_and_reaches_waiters(redis_cli):
+    store = _store(redis_cli)
+    gate = asyncio.Event()
+
+    async def boom():
+        await gate.wait()
+        raise RuntimeError("provider down")
+
+    tasks = [asyncio.create_task(store.run_once("create", "k3", boom)) for _ in range(3)]
+    await asyncio.sleep(0.05)
+    gate.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert store._inflight == {}
+    assert await redis_cli.get("t:idem:lock:create:k3") is None
+    # следующий вызов не ждёт лока
+    assert await asyncio.wait_for(store.run_once("create", "k3", _cached_call(store, "k3", [])), 1) == {
+        "order": "k3", "n": 1,
+    }
+
+
+async def test_cancelled_call_releases_lock(redis_cli):
+    store = _store(redis_cli)
+    calls: list = []
+    task = asyncio.create_task(store.run_once("create", "k4", _cached_call(store, "k4", calls, asyncio.Event())))
+    await asyncio.sleep(0.05)
+    # ожидающие того же ключа переживают отмену первого вызова
+    waiters = [asyncio.create_task(store.run_once("create", "k4", _cached_call(store, "k4", calls))) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    results = await asyncio.wait_for(asyncio.gather(*waiters), 1)
+    assert calls == ["k4", "k4"]
+    assert all(r == {"order": "k4", "n": 2} for r in results)
+    assert store._inflight == {}
+    assert await redis_cli.get("t:idem:lock:create:k4") is None
+
+
+async def test_cancelled_waiter_does_not_cancel_flight(redis_cli):
+    store = _store(redis_cli)
+    gate = asyncio.Event()
+    first = asyncio.create_task(store.run_once("create", "k6", _cached_call(store, "k6", [], gate)))
+    await asyncio.sleep(0.01)
+    waiter = asyncio.create_task(store.run_once("create", "k6", _cached_call(store, "k6", [])))
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    gate.set()
+    assert await first == {"order": "k6", "n": 1}
+
+
+async def test_foreign_lock_is_not_released(redis_cli):
+    # наш лок истёк по TTL и его взял другой под — снимать чужой нельзя
+    store = _store(redis_cli, lock_ttl_sec=1)
+
+    async def slow():
+        await redis_cli.set("t:idem:lock:create:k5", "other-pod")
+        return {"ok": True}
+
+    assert await store.run_once("create", "k5", slow) == {"ok": True}
+    assert await redis_cli.get("t:idem:lock:create:k5") == "other-pod"
@@ -0,0 +1,65 @@
+import os
+import uuid
+
+import pytest
+
+from app.db import Database
+from app.ledger import OrderLedger
+
+pytestmark = pytest.mark.anyio
+
+# отдельная база: схема db-pay создаётся на старте, тест пишет в payment_orders
+TEST_DSN = os.getenv("PAYAPI_TEST_DATABASE_URL")
+
+
+class _NoDB:
+    enabled = True
+
+    def prepare(self, statement: str) -> None:
+        pass
+
+
+def test_full_buffer_drops_oldest():
+    ledger = OrderLedger(_NoDB(), batch=100, max_pending=3)
+    for i in range(5):
+        ledger.order_created(f"p{i}", "freekassa", "10", None)
+
+    assert ledger.stats["dropped"] == 2
+    assert [params[0] for _, params in ledger._pending] == ["p2", "p3", "p4"]
+
+
+@pytest.fixture
+async def ledger():
+    if not TEST_DSN:
+        pytest.skip("PAYAPI_TEST_DATABASE_URL not set")
+    db = Database(TEST_DSN, pool_min=1, pool_max=2)
+    led = OrderLedger(db, batch=10)
+    await db.start()
+    yield led
+    await db.close()
+
+
+async def test_flush_counts_only_written_rows(ledger):
+    prefix = uuid.uuid4().hex[:8]
+    for i in range(3):
+        ledger.order_created(f"{prefix}-{i}", "freekassa", "10.00", "https://pay.example.com/")
+    # provider NOT NULL — пачка падает, строки пишутся по одной, эта теряется
+    ledger._add("ledger_order_created", (f"{prefix}-bad", None, None, None, "RUB", None))
+
+    assert await ledger.flush() == 4
+
+    assert ledger.stats["written"] == 3
+    assert ledger.stats["failed"] == 1
+    assert (await ledger.lookup(f"{prefix}-0"))["order"]["provider"] == "freekassa"
+    assert await ledger.lookup(f"{prefix}-bad") is None
+
+
+async def test_flush_takes_one_batch(ledger):
+    prefix = uuid.uuid4().hex[:8]
+    for i in range(15):
+        ledger.order_created(f"{prefix}-{i}", "freekassa", "1", None)
+
+    assert await ledger.flush() == 10
+    assert len(ledger._pending) == 5
+    assert await ledger.flush() == 5
+    assert ledger.stats == {"written": 15, "dropped": 0, "failed": 0, "flushes": 2}
@@ -0,0 +1,47 @@
+import pytest
+
+from app import paylink_tokens
+from app.paylink_tokens import PayLinkSigner, is_signed_token
+
+URL = "https://pay.example.com/form?o=42&s=abc|def"
+
+
+@pytest.fixture
+def signer() -> PayLinkSigner:
+    return PayLinkSigner("test-key")
+
+
+def test_roundtrip(signer):
+    token = signer.issue("fk", URL, 600)
+    assert is_signed_token(token)
+    assert signer.verify("fk", token) == URL
+
+
+def test_scope_is_part_of_signature(signer):
+    # токен v1 не открывается через /v2/pay
+    assert signer.verify("plnk", signer.issue("fk", URL, 600)) is None
+
+
+def test_other_key_rejected(signer):
+    assert PayLinkSigner("other-key").verify("fk", signer.issue("fk", URL, 600)) is None
+
+
+def test_expired_token_rejected(signer, monkeypatch):
+    token = signer.issue("fk", URL, 60)
+    now = paylink_tokens.time.time()
+    monkeypatch.setattr(paylink_tokens.time, "time", lambda: now + 61)
+    assert signer.verify("fk", token) is None
+
+
+def test_tampered_body_rejected(signer):
+    token = signer.issue("fk", URL, 600)
+    forged = signer.issue("fk", "https://evil.example.com/", 600)
+    body, sig = token[len("s1."):].split(".")
+    forged_body = forged[len("s1."):].split(".")[0]
+    assert signer.verify("fk", f"s1.{forged_body}.{sig}") is None
+    assert signer.verify("fk", f"s1.{body}.{sig}") == URL
+
+
+@pytest.mark.parametrize("token", ["", "abc", "s1.", "s1.nodot", "s1.!!!.@@@", "s1.YQ.YQ"])
+def test_garbage_rejected(signer, token):
+    assert signer.verify("fk", token) is None
@@ -0,0 +1,90 @@
+import pytest
+from fastapi import HTTPException
+
+from app.ratelimit import RateLimiter
+
+pytestmark = pytest.mark.anyio
+
+
+async def _tokens(redis_cli, limiter: RateLimiter, tier: int, ident: str = "c1") -> float:
+    return float(await redis_cli.hget(f"rl:{limiter.scope}:{tier}:{ident}", "tokens"))
+
+
+async def test_every_tier_pays_for_allowed_request(redis_cli):
+    # burst 3 и медленный длинный ярус 10 на ~100 с
+    limiter = RateLimiter(redis_cli, "t", [(3, 1), (10, 0.1)])
+
+    for _ in range(3):
+        assert await limiter.acquire("c1") == 0.0
+
+    assert await _tokens(redis_cli, limiter, 0) == pytest.approx(0, abs=0.01)
+    assert await _tokens(redis_cli, limiter, 1) == pytest.approx(7, abs=0.01)
+
+
+async def test_denied_request_deducts_nothing(redis_cli):
+    limiter = RateLimiter(redis_cli, "t", [(5, 0.01), (2, 0.01)])
+    assert await limiter.acquire("c1") == 0.0
+    assert await limiter.acquire("c1") == 0.0
+
+    wait = await limiter.acquire("c1")
+
+    assert wait == pytest.approx(100, rel=0.05)  # (1 - 0) / 0.01
+    # отказ во втором ярусе не съел токен первого
+    assert await _tokens(redis_cli, limiter, 0) == pytest.approx(3, abs=0.01)
+
+
+async def test_wait_is_the_longest_over_tiers(redis_cli):
+    limiter = RateLimiter(redis_cli, "t", [(1, 1), (1, 0.5)])
+    assert await limiter.acquire("c1") == 0.0
+    assert await limiter.acquire("c1") == pytest.approx(2, rel=0.05)
+
+
+async def test_cost_above_capacity_drains_bucket(redis_cli):
+    limiter = RateLimiter(redis_cli, "t", [(10, 1)])
+    assert await limiter.acquire("c1", cost=100) == 0.0
+    assert await _tokens(redis_cli, limiter, 0) == pytest.approx(0, abs=0.01)
+    assert await limiter.acquire("c1", cost=100) > 0
+
+
+async def test_clients_have_separate_buckets(redis_cli):
+    limiter = RateLimiter(redis_cli, "t", [(1, 0.01)])
+    assert await limiter.acquire("c1") == 0.0
+    assert await limiter.acquire("c1") > 0
+    assert await limiter.acquire("c2") == 0.0
+
+
+async def test_denial_is_remembered_without_redis(redis_cli):
+    limiter = RateLimiter(redis_cli, "t", [(1, 0.01)])
+    await limiter.acquire("c1")
+    assert await limiter.acquire("c1") > 0
+
+    async def unreachable(**kw):
+        raise AssertionError("Redis must not be called while the client is known to wait")
+
+    limiter._script = unreachable
+    assert await limiter.acquire("c1") > 0
+
+
+async def test_redis_failure_lets_requests_through(redis_cli):
+    limiter = RateLimiter(redis_cli, "t", [(1, 0.01)])
+
+    async def broken(**kw):
+        raise ConnectionError("redis down")
+
+    limiter._script = broken
+    assert await limiter.acquire("c1") == 0.0
+
+
+async def test_enforce_raises_429_with_retry_after(redis_cli):
+    limiter = RateLimiter(redis_cli, "t", [(1, 0.4)])
+    await limiter.enforce("c1")
+    with pytest.raises(HTTPException) as e:
+        await limiter.enforce("c1")
+    assert e.value.status_code == 429
+    assert e.value.headers["Retry-After"] == "3"  # 2.5 с вверх
+
+
+async def test_zero_tiers_disable_limiter(redis_cli):
+    limiter = RateLimiter(redis_cli, "t", [(0, 10), (5, 0)])
+    assert not limiter.enabled
+    assert await limiter.acquire("c1", cost=1000) == 0.0
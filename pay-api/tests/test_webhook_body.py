@@ -0,0 +1,75 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.webhook_body import read_webhook_payload
+
+LIMIT = 1024
+
+app = FastAPI()
+
+
+@app.post("/hook")
+async def hook(request: Request):
+    payload, lowered = await read_webhook_payload(request, LIMIT)
+    return {"payload": payload, "lowered": lowered}
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+def test_form_body(client):
+    r = client.post("/hook", content=b"MERCHANT_ORDER_ID=A-1&AMOUNT=10.00&empty=",
+                    headers={"content-type": "application/x-www-form-urlencoded"})
+    assert r.status_code == 200
+    assert r.json() == {
+        "payload": {"MERCHANT_ORDER_ID": "A-1", "AMOUNT": "10.00", "empty": ""},
+        "lowered": {"merchant_order_id": "A-1", "amount": "10.00", "empty": ""},
+    }
+
+
+def test_json_body(client):
+    r = client.post("/hook", content=b'{"Status": "success", "n": 1}', headers={"content-type": "application/json"})
+    assert r.status_code == 200
+    assert r.json()["lowered"] == {"status": "success", "n": 1}
+
+
+@pytest.mark.parametrize("body", [b"{not json", b"[1, 2]", b'"str"'])
+def test_bad_json_is_400(client, body):
+    r = client.post("/hook", content=body, headers={"content-type": "application/json"})
+    assert r.status_code == 400
+
+
+def test_declared_length_over_limit_is_413(client):
+    r = client.post("/hook", content=b"a=" + b"x" * LIMIT,
+                    headers={"content-type": "application/x-www-form-urlencoded"})
+    assert r.status_code == 413
+
+
+def test_body_at_limit_is_accepted(client):
+    r = client.post("/hook", content=b"a=" + b"x" * (LIMIT - 2),
+                    headers={"content-type": "application/x-www-form-urlencoded"})
+    assert r.status_code == 200
+
+
+def test_chunked_body_over_limit_is_413(client):
+    def chunks():
+        for _ in range(4):
+            yield b"x" * 512
+
+    # генератор — без Content-Length, размер считается по ходу чтения
+    r = client.post("/hook", content=chunks(), headers={"content-type": "application/x-www-form-urlencoded"})
+    assert r.status_code == 413
+
+
+def test_chunked_body_under_limit_is_parsed(client):
+    def chunks():
+        yield b"a=1&"
+        yield b"B=2"
+
+    r = client.post("/hook", content=chunks(), headers={"content-type": "application/x-www-form-urlencoded"})
+    assert r.status_code == 200
+    assert r.json()["lowered"] == {"a": "1", "b": "2"}